@@ -0,0 +1,179 @@
+"""Batch feedback scoring used in the Mastermind project.
+
+Scores one guess against many secrets at once. Guesses and secrets are
+given as colour digits (see CodeSpace.to_digits). NumPy is used when
+installed, otherwise every secret is scored in pure Python.
+
+"""
+
+from itertools import izip
+from operator import eq
+
+try:
+    import numpy
+except ImportError:  # Optional dependency
+    numpy = None
+
+
+def code_matrix(indices, pattern_length, base):
+    """Return N x pattern_length matrix of colour digits of code indices."""
+    if numpy is None:
+        matrix = []
+        for index in indices:
+            digits = [0] * pattern_length
+            for i in range(pattern_length - 1, -1, -1):
+                index, digits[i] = divmod(index, base)
+            matrix.append(digits)
+        return matrix
+
+    indices = numpy.asarray(indices, dtype=numpy.int64)
+    matrix = numpy.empty((len(indices), pattern_length), dtype=numpy.int64)
+    for i in range(pattern_length - 1, -1, -1):
+        indices, matrix[:, i] = numpy.divmod(indices, base)
+    return matrix
+
+
+def score_batch(guess, secrets, base):
+    """Return (blacks, whites) of guess against every secret in secrets.
+
+    >>> [map(int, counts) for counts in score_batch([0, 0, 1, 1], [[0, 1, 0, 1], [2, 2, 2, 2]], 3)]
+    [[2, 0], [2, 0]]
+
+    """
+    if numpy is None:
+        return _score_batch_python(guess, secrets, base)
+
+    guess = numpy.asarray(guess, dtype=numpy.int64)
+    secrets = numpy.asarray(secrets, dtype=numpy.int64).reshape(-1, len(guess))
+    rows = len(secrets)
+
+    blacks = (secrets == guess).sum(axis=1)
+
+    # Colour histogram of every secret in one bincount over offset digits
+    offsets = (numpy.arange(rows, dtype=numpy.int64) * base)[:, numpy.newaxis]
+    secret_counts = numpy.bincount((secrets + offsets).ravel(), minlength=rows * base)
+    secret_counts = secret_counts.reshape(rows, base)
+    guess_counts = numpy.bincount(guess, minlength=base)
+
+    matches = numpy.minimum(secret_counts, guess_counts).sum(axis=1)
+    return blacks, matches - blacks
+
+
+def _score_batch_python(guess, secrets, base):
+    """Return (blacks, whites) of guess against secrets without NumPy."""
+    guess_counts = [0] * base
+    for digit in guess:
+        guess_counts[digit] += 1
+
+    blacks = []
+    whites = []
+    for secret in secrets:
+        black = 0
+        secret_counts = [0] * base
+        for i, digit in enumerate(secret):
+            if digit == guess[i]:
+                black += 1
+            secret_counts[digit] += 1
+
+        matches = 0
+        for colour in range(base):
+            matches += min(guess_counts[colour], secret_counts[colour])
+
+        blacks.append(black)
+        whites.append(matches - black)
+    return blacks, whites
+
+
+def score_keys(guess, secrets, base):
+    """Return encoded feedback (see CodeSpace.feedback_key) of guess against
+    every secret in secrets, as a list or a NumPy uint8 array."""
+    blacks, whites = score_batch(guess, secrets, base)
+    if numpy is None:
+        return [black * (len(guess) + 1) + white for black, white in zip(blacks, whites)]
+    return (blacks * (len(guess) + 1) + whites).astype(numpy.uint8)
+
+
+def filter_codes(guess, candidates, key, pattern_length, base):
+    """Return code indices in candidates which give encoded feedback key for
+    guess digits."""
+    keys = score_keys(guess, code_matrix(candidates, pattern_length, base), base)
+    if numpy is None:
+        return [code for code, code_key in zip(candidates, keys) if code_key == key]
+    return numpy.asarray(candidates)[keys == key].tolist()
+
+
+def colour_counts(secrets, base):
+    """Return colour count of every secret in secrets, as tuples or as a
+    NumPy matrix, for count_partitions."""
+    if numpy is None:
+        counts = []
+        for secret in secrets:
+            count = [0] * base
+            for digit in secret:
+                count[digit] += 1
+            counts.append(tuple(count))
+        return counts
+
+    secrets = numpy.asarray(secrets, dtype=numpy.int64)
+    rows = len(secrets)
+    offsets = (numpy.arange(rows, dtype=numpy.int64) * base)[:, numpy.newaxis]
+    counts = numpy.bincount((secrets + offsets).ravel(), minlength=rows * base)
+    return counts.reshape(rows, base)
+
+
+def count_partitions(guess, secrets, secret_counts, base):
+    """Return number of secrets giving every encoded feedback for guess.
+
+    secret_counts are the colour counts of secrets (see colour_counts).
+    Without NumPy, colours matched are worked out once per distinct colour
+    count, so a secret costs little more than its position compare.
+
+    >>> count_partitions([0, 1], [[0, 1], [1, 0], [1, 1]], colour_counts([[0, 1], [1, 0], [1, 1]], 2), 2)[2:7]
+    [1, 1, 0, 0, 1]
+
+    """
+    pattern_length = len(guess)
+    key_count = (pattern_length + 1) ** 2
+    guess_counts = [0] * base
+    for digit in guess:
+        guess_counts[digit] += 1
+
+    if numpy is None:
+        partitions = [0] * key_count
+        matches = {}  # Colours matched by colour count of secret
+        for secret, counts in izip(secrets, secret_counts):
+            match = matches.get(counts)
+            if match is None:
+                match = matches[counts] = sum(map(min, guess_counts, counts))
+            # Key blacks * (length + 1) + whites, as whites = matches - blacks
+            partitions[sum(map(eq, guess, secret)) * pattern_length + match] += 1
+        return partitions
+
+    secrets = numpy.asarray(secrets, dtype=numpy.int64)
+    blacks = (secrets == numpy.asarray(guess, dtype=numpy.int64)).sum(axis=1)
+    matches = numpy.minimum(secret_counts, guess_counts).sum(axis=1)
+    return numpy.bincount(blacks * pattern_length + matches, minlength=key_count)
+
+
+def as_codes(codes):
+    """Return code indices in the fastest form for repeated lookups."""
+    if numpy is None:
+        return codes
+    return numpy.asarray(codes, dtype=numpy.intp)
+
+
+def lookup_keys(row, codes):
+    """Return encoded feedback of a cached feedback row at code indices."""
+    if numpy is None:
+        return [row[code] for code in codes]
+    return numpy.frombuffer(row, dtype=numpy.uint8)[codes]
+
+
+def count_keys(keys, key_count):
+    """Return number of occurrences of every encoded feedback in keys."""
+    if numpy is None:
+        counts = [0] * key_count
+        for key in keys:
+            counts[key] += 1
+        return counts
+    return numpy.bincount(keys, minlength=key_count)
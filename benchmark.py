@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+
+"""Benchmark suite of the solving algorithm of the Mastermind project.
+
+Solves every secret of every game set (or a fixed-seed sample of the larger
+ones) and writes the results to a JSON file, which can then be compared
+with the results of an earlier run:
+    $ ./benchmark.py run [results] [solver] [game sets]
+    $ ./benchmark.py compare [old results] [new results] [threshold]
+
+solver is 'classic' (generate_solutions), 'indexed' or a guess strategy;
+game sets are given as e.g. 4x6,5x8 (pegs x colours).
+
+The memory held per simulated game in progress is measured by keeping
+many games open at once:
+    $ ./benchmark.py memory [games] [length] [colours] [strategy]
+
+The feedback of a codemaker is timed against that of the earlier
+list-based implementation, for 3-8 pegs:
+    $ ./benchmark.py feedback [turns] [colours]
+
+"""
+
+import Queue
+import gc
+import json
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+from code_space import get_code_space
+from functions import remove_empty_elements
+from player import Player
+from simulation import COLOUR_CODES, FEEDBACK_KEYS, TURNS, create_players, solve_secret, \
+        solver_options
+from solving_algorithm import solution_cache
+
+EXHAUSTIVE_LIMIT = 5000  # Largest code space solved secret by secret
+SAMPLE_SIZE = 500        # Secrets sampled from larger code spaces
+SAMPLE_SEED = 0
+MAX_TURNS = 50           # Turns after which a secret counts as unsolved
+THRESHOLD = 0.05         # Allowed relative worsening of a metric
+MEMORY_GAMES = 100000    # Games kept open by the memory benchmark
+MEMORY_TURNS = 2         # Turns played in every open game
+FEEDBACK_TURNS = 100000  # Feedbacks timed per pattern length
+FEEDBACK_REPEATS = 5     # Timings of which the best counts
+POLL_SECONDS = 1         # Wait for a child result between liveness checks
+
+METRICS = ['average_guesses', 'worst_guesses', 'failures', 'seconds_per_game', 'peak_rss_kb']
+
+def game_sets(sizes=range(3, 9)):
+    """Return every (length, colours) game set the options allow."""
+    return [(length, colours) for length in sizes for colours in sizes]
+
+
+def choose_secrets(size):
+    """Return secret indices to solve in a code space of given size."""
+    if size <= EXHAUSTIVE_LIMIT:
+        return range(size)
+    return sorted(random.Random(SAMPLE_SEED).sample(xrange(size), SAMPLE_SIZE))
+
+
+def benchmark_game_set(length, colours, solver):
+    """Return benchmark results of solver on given game set."""
+    codemaker, codebreaker = create_players(length, colours, *solver_options(solver))
+    code_space = get_code_space(length, COLOUR_CODES[:colours])
+
+    secrets = choose_secrets(code_space.size)
+    guesses = []
+    failures = 0
+    unsolved = 0
+
+    start = time.time()
+    for index in secrets:
+        turns = solve_secret(codebreaker, code_space.decode(index), MAX_TURNS)
+        if turns is None:
+            unsolved += 1
+            failures += 1
+            continue
+        if turns > TURNS:
+            failures += 1
+        guesses.append(turns)
+    seconds = time.time() - start
+
+    return {
+            'length': length,
+            'colours': colours,
+            'secrets': len(secrets),
+            'sampled': len(secrets) < code_space.size,
+            'average_guesses': float(sum(guesses)) / max(len(guesses), 1),
+            'worst_guesses': max(guesses) if guesses else None,
+            'failures': failures,
+            'unsolved': unsolved,
+            'seconds_per_game': seconds / len(secrets),
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'solution_cache': solution_cache.stats()
+            }
+
+
+def run_in_child(results, length, colours, solver):
+    """Benchmark game set in a child process, so that its peak memory and
+    caches are its own."""
+    results.put(benchmark_game_set(length, colours, solver))
+
+
+def child_result(target, *args):
+    """Return what target put in its queue when run in a child process
+    with args, or None if the child died first, and the child exit code."""
+    queue = multiprocessing.Queue()
+    child = multiprocessing.Process(target=target, args=(queue,) + args)
+    child.start()
+
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=POLL_SECONDS)
+        except Queue.Empty:
+            if not child.is_alive() and queue.empty():  # Died without a result
+                break
+    child.join()
+    return result, child.exitcode
+
+
+def current_commit():
+    """Return commit hash of the working tree, else None."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(results_name, solver='indexed', sets=None):
+    """Benchmark solver on game sets and write results to results_name;
+    return number of game sets whose child process failed."""
+    results = {'solver': solver, 'commit': current_commit(), 'game_sets': {}, 'failed': {}}
+
+    for length, colours in sets or game_sets():
+        game_set = '%dx%d' % (length, colours)
+        result, exitcode = child_result(run_in_child, length, colours, solver)
+        if result is None:
+            results['failed'][game_set] = exitcode
+            print "%s : FAILED, benchmark process exited with code %s" % (game_set, exitcode)
+            continue
+
+        results['game_sets'][game_set] = result
+        print "%dx%d : %5d secrets  average %.3f  worst %s  failures %d  %.2f ms/game  %d KB" \
+                "  cache hits %.1f%%" % (
+                length, colours, result['secrets'], result['average_guesses'],
+                result['worst_guesses'], result['failures'],
+                result['seconds_per_game'] * 1000, result['peak_rss_kb'],
+                100 * result['solution_cache']['hit_rate'])
+
+    results_file = open(results_name, 'w')
+    json.dump(results, results_file, indent=2, sort_keys=True)
+    results_file.close()
+    return len(results['failed'])
+
+
+def compare(old_name, new_name, threshold=THRESHOLD):
+    """Show metrics of new results worse than old results by more than
+    threshold; return number of regressions."""
+    old = json.load(open(old_name))
+    new = json.load(open(new_name))
+
+    regressions = 0
+    for game_set in sorted(set(old['game_sets']) & set(new['game_sets'])):
+        for metric in METRICS:
+            old_value = old['game_sets'][game_set][metric]
+            new_value = new['game_sets'][game_set][metric]
+            if old_value is None or new_value is None:
+                continue
+            if new_value > old_value * (1 + threshold) and new_value > old_value:
+                regressions += 1
+                print "REGRESSION %s %-16s : %s -> %s" % (game_set, metric, old_value, new_value)
+
+    print "%d regression(s) from %s to %s" % (regressions, old.get('commit'), new.get('commit'))
+    return regressions
+
+
+def open_games(games, length, colours, strategy):
+    """Return given number of games in progress, each a codemaker and a
+    codebreaker with MEMORY_TURNS turns played."""
+    in_progress = []
+    for game in range(games):
+        codemaker, codebreaker = create_players(length, colours, strategy)
+        codemaker.ready_for_game()
+        codebreaker.ready_for_game()
+        codemaker.choose_secret_pattern()
+        for turn in range(MEMORY_TURNS):
+            codebreaker.make_guess()
+            codemaker.prepare_feedback(codebreaker.guess, FEEDBACK_KEYS)
+            codebreaker.analyse_feedback(codemaker.feedback)
+        in_progress.append((codemaker, codebreaker))
+    return in_progress
+
+
+def measure_memory(results, games, length, colours, strategy):
+    """Put peak memory growth of keeping games open into results."""
+    create_players(length, colours, strategy)  # Load shared tables first
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    kept = open_games(games, length, colours, strategy)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((after - before, len(kept)))
+
+
+def memory(games=MEMORY_GAMES, length=4, colours=6, strategy=None):
+    """Show memory held per simulated game in progress; return bytes per
+    game, else None if the measuring process failed."""
+    result, exitcode = child_result(measure_memory, games, length, colours, strategy)
+    if result is None:
+        print "%dx%d : FAILED, memory process exited with code %s" % (length, colours, exitcode)
+        return None
+
+    growth_kb, kept = result
+    per_game = growth_kb * 1024.0 / kept
+    print "%dx%d : %d open games  %d KB  %.0f bytes/game" % (length, colours, kept, growth_kb, per_game)
+    return per_game
+
+
+def list_feedback(secret_pattern, guess, feedback_keys):
+    """Return feedback for guess as computed before colour codes, marking
+    and removing done pegs."""
+    feedback = []
+
+    guess = list(guess)
+    secret_pattern = list(secret_pattern)
+
+    for i, colour in enumerate(guess):
+        if colour == secret_pattern[i]:
+            feedback.append(feedback_keys['correct'])
+            guess[i] = secret_pattern[i] = None
+
+    remove_empty_elements(guess)
+    remove_empty_elements(secret_pattern)
+
+    for i, colour in enumerate(guess):
+        if colour in secret_pattern:
+            feedback.append(feedback_keys['partially_correct'])
+            secret_pattern[secret_pattern.index(colour)] = None
+
+    return feedback
+
+
+def best_time(function, repeats=FEEDBACK_REPEATS):
+    """Return least seconds function took in repeated calls, without
+    garbage collection, as timeit does."""
+    times = []
+    gc.disable()
+    try:
+        for repeat in range(repeats):
+            start = time.time()
+            function()
+            times.append(time.time() - start)
+    finally:
+        gc.enable()
+    return min(times)
+
+
+def feedback(turns=FEEDBACK_TURNS, colours=6):
+    """Show time per feedback of a codemaker against the list-based
+    implementation, for every pattern length; return speedups by length."""
+    speedups = {}
+    for length in range(3, 9):
+        code_space = get_code_space(length, COLOUR_CODES[:colours])
+        sample = random.Random(SAMPLE_SEED)
+        secret = code_space.decode(sample.randrange(code_space.size))
+        guesses = [code_space.decode(sample.randrange(code_space.size)) for turn in range(turns)]
+
+        codemaker = Player()
+        codemaker.remember_rules(length, COLOUR_CODES[:colours])
+        codemaker.secret_pattern = secret
+
+        old_seconds = best_time(lambda: [list_feedback(secret, guess, FEEDBACK_KEYS) for guess in guesses])
+        new_seconds = best_time(lambda: [codemaker.prepare_feedback(guess, FEEDBACK_KEYS) for guess in guesses])
+
+        for guess in guesses[:1000]:  # Same feedback
+            codemaker.prepare_feedback(guess, FEEDBACK_KEYS)
+            if codemaker.feedback != list_feedback(secret, guess, FEEDBACK_KEYS):
+                raise AssertionError("Feedback differs for %s against %s" % (''.join(guess), ''.join(secret)))
+
+        speedups[length] = old_seconds / new_seconds
+        print "%dx%d : lists %.2f us  colour code %.2f us  speedup %.2fx" % (length, colours,
+                old_seconds / turns * 1e6, new_seconds / turns * 1e6, speedups[length])
+    return speedups
+
+
+def parse_game_sets(text):
+    """Return game sets of text such as 4x6,5x8."""
+    return [tuple(int(value) for value in game_set.split('x')) for game_set in text.split(',')]
+
+
+def main():
+    """Benchmark entry point."""
+    try:
+        command = sys.argv[1]
+    except IndexError:
+        command = 'run'
+
+    if command == 'run':
+        results_name = sys.argv[2] if len(sys.argv) > 2 else 'benchmark.json'
+        solver = sys.argv[3] if len(sys.argv) > 3 else 'indexed'
+        sets = parse_game_sets(sys.argv[4]) if len(sys.argv) > 4 else None
+        if run(results_name, solver, sets):
+            sys.exit(1)
+    elif command == 'memory':
+        games = int(sys.argv[2]) if len(sys.argv) > 2 else MEMORY_GAMES
+        length = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+        colours = int(sys.argv[4]) if len(sys.argv) > 4 else 6
+        strategy = sys.argv[5] if len(sys.argv) > 5 else None
+        if memory(games, length, colours, strategy) is None:
+            sys.exit(1)
+    elif command == 'feedback':
+        turns = int(sys.argv[2]) if len(sys.argv) > 2 else FEEDBACK_TURNS
+        colours = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+        feedback(turns, colours)
+    elif command == 'compare' and len(sys.argv) > 3:
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else THRESHOLD
+        if compare(sys.argv[2], sys.argv[3], threshold):
+            sys.exit(1)
+    else:
+        print "Usage: %s [run [results] [solver] [game sets]|compare old new [threshold]" % sys.argv[0]
+        print "       |memory [games] [length] [colours] [strategy]|feedback [turns] [colours]]"
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,45 @@
 """Definition of the Board class used in the Mastermind project."""
 
+from instrumentation import timed
+
 class Board(object):
 
-    """Mastermind Board class."""
+    """Mastermind Board class.
+
+    The board is stored as one byte per peg: pegs holds the colour codes of
+    every guess and keys the feedback keys of every turn, 0 where empty.
+    Rows are rendered to text only when displayed, and cached until their
+    turn is updated.
+
+    """
+
+    __slots__ = ('pattern_length', 'screen_width', 'turns', 'pegs', 'keys', 'cache')
 
     def __init__(self, pattern_length, screen_width, turns):
         self.pattern_length = pattern_length
         self.screen_width = screen_width
+        self.turns = turns
 
-        # Initialise board
+        self.pegs = bytearray(turns * pattern_length)
+        self.keys = bytearray(turns * pattern_length)
+        self.cache = [None] * turns  # Rendered guess row of every turn
+
+
+    def __getstate__(self):
+        """Return state for pickling."""
+        return self.pattern_length, self.screen_width, self.turns, str(self.pegs), str(self.keys)
 
-        self.board = []
-        board_row = self.__create_row("|", " ")
-        board_end = self.__create_row("+", "-")
 
-        self.board.append(board_end)
-        for row in range(turns * 2 + 1):
-            self.board.append(board_row)
-        self.board.append(board_end)
+    def __setstate__(self, state):
+        """Restore pickled state, including boards of rendered rows pickled
+        by earlier versions."""
+        if isinstance(state, dict):  # Earlier version, as found in old saves
+            Board.__init__(self, state['pattern_length'], state['screen_width'], (len(state['board']) - 3) / 2)
+            return
+        self.pattern_length, self.screen_width, self.turns, pegs, keys = state
+        self.pegs = bytearray(pegs)
+        self.keys = bytearray(keys)
+        self.cache = [None] * self.turns
 
 
     def __create_row(self, border, slot):
@@ -27,20 +49,56 @@ class Board(object):
                 (slot * (self.pattern_length * 2 + 1)) + border
 
 
+    def __render_turn(self, turn):
+        """Return board row of guess and feedback at turn."""
+        guess = self.guess(turn)
+        if not guess:
+            return self.__create_row("|", " ")
+
+        feedback = self.feedback(turn)
+        return "%s|  %s  | %s |" % (" " * (self.screen_width / 4),
+                "  ".join(guess),
+                " ".join(feedback + [" "] * (self.pattern_length - len(feedback))))
+
+
+    def guess(self, turn):
+        """Return guess at turn, empty if none yet."""
+        start = turn * self.pattern_length
+        return [chr(code) for code in self.pegs[start:start + self.pattern_length] if code]
+
+
+    def feedback(self, turn):
+        """Return feedback at turn."""
+        start = turn * self.pattern_length
+        return [chr(code) for code in self.keys[start:start + self.pattern_length] if code]
+
+
+    @timed('board rows')
+    def rows(self):
+        """Return board rows, followed by an empty row."""
+        board_row = self.__create_row("|", " ")
+        board_end = self.__create_row("+", "-")
+
+        rows = [board_end, board_row]
+        for turn in range(self.turns):
+            if self.cache[turn] is None:
+                self.cache[turn] = self.__render_turn(turn)
+            rows.append(self.cache[turn])
+            rows.append(board_row)
+        rows.append(board_end)
+        rows.append('')
+        return rows
+
+
     def display(self):
         """Display board."""
-        print '\n'.join(self.board) + '\n'
+        print '\n'.join(self.rows())
 
 
     def update(self, turn, guess, feedback):
         """Update board with given guess and feedback at turn."""
-        board_row = (" " * (self.screen_width / 4)) + "|  "
-        for colour in guess:
-            board_row += colour + "  "          # Add guess
-        board_row += "| "
-        for key in feedback:
-            board_row += key + " "              # Add feedback
-        for empty_key in range(self.pattern_length - len(feedback)):
-            board_row += "  "                   # Add empty slots
-        board_row += "|"
-        self.board[(turn + 1) * 2] = board_row  # Update board row
+        start = turn * self.pattern_length
+        self.pegs[start:start + self.pattern_length] = ''.join(guess)
+        keys = ''.join(feedback)
+        self.keys[start:start + self.pattern_length] = keys + '\0' * (self.pattern_length - len(keys))
+        self.cache[turn] = None  # Render again when displayed
@@ -0,0 +1,266 @@
+"""Definition of the CodeSpace class used in the Mastermind project.
+
+Every pattern of a game set is encoded as an integer in base
+len(pattern_colours), most significant peg first, so that code indices sort
+in the same order as the patterns they stand for.
+
+Feedback is encoded as a single small integer,
+    blacks * (pattern_length + 1) + whites
+which always fits in an unsigned byte for the supported 3-8 pegs.
+
+"""
+
+import math
+from array import array
+
+from batch_feedback import code_matrix, filter_codes, score_keys
+
+TABLE_LIMIT = 4096  # Largest code space for which feedback rows are cached
+
+class CodeSpace(object):
+
+    """Mastermind CodeSpace class."""
+
+    def __init__(self, pattern_length, pattern_colours):
+        self.pattern_length = pattern_length
+        self.pattern_colours = list(pattern_colours)
+        self.base = len(self.pattern_colours)
+        self.size = self.base ** self.pattern_length
+
+        self.colour_digits = dict((colour, digit) for digit, colour in enumerate(self.pattern_colours))
+
+        self.table = {}     # Feedback rows keyed by guess index, filled lazily
+        self.matrix = None  # Digits of every code, filled lazily
+
+
+    def encode(self, pattern):
+        """Return index of pattern."""
+        index = 0
+        for colour in pattern:
+            index = index * self.base + self.colour_digits[colour]
+        return index
+
+
+    def decode(self, index):
+        """Return pattern of index as a list of colours."""
+        return [self.pattern_colours[digit] for digit in self.to_digits(index)]
+
+
+    def colour_code(self, pattern):
+        """Return colour digits of pattern, and its count of every colour
+        digit."""
+        digits = [self.colour_digits[colour] for colour in pattern]
+        counts = [0] * self.base
+        for digit in digits:
+            counts[digit] += 1
+        return digits, counts
+
+
+    def to_digits(self, index):
+        """Return colour digits of index, most significant peg first."""
+        digits = [0] * self.pattern_length
+        for i in range(self.pattern_length - 1, -1, -1):
+            index, digits[i] = divmod(index, self.base)
+        return digits
+
+
+    def feedback_key(self, blacks, whites):
+        """Return encoded feedback for given number of blacks and whites."""
+        return blacks * (self.pattern_length + 1) + whites
+
+
+    def split_key(self, key):
+        """Return (blacks, whites) of encoded feedback."""
+        return divmod(key, self.pattern_length + 1)
+
+
+    def key_of(self, feedback):
+        """Return encoded feedback of a list of feedback keys.
+
+        Partially correct pegs are always keyed 'w'; correct pegs are keyed
+        'b' in the text interface and 'k' in the graphical one.
+
+        """
+        whites = list(feedback).count('w')
+        return self.feedback_key(len(feedback) - whites, whites)
+
+
+    def score(self, guess, secret):
+        """Return encoded feedback of guess index against secret index."""
+        row = self.table.get(guess)
+        if row is not None:
+            return row[secret]
+        return self.__score_digits(self.to_digits(guess), self.to_digits(secret))
+
+
+    def __score_digits(self, guess, secret):
+        """Return encoded feedback of guess digits against secret digits."""
+        blacks = 0
+        guess_counts = [0] * self.base
+        secret_counts = [0] * self.base
+        for i in range(self.pattern_length):
+            if guess[i] == secret[i]:
+                blacks += 1
+            guess_counts[guess[i]] += 1
+            secret_counts[secret[i]] += 1
+
+        matches = 0
+        for colour in range(self.base):
+            matches += min(guess_counts[colour], secret_counts[colour])
+
+        return self.feedback_key(blacks, matches - blacks)
+
+
+    def feedback_row(self, guess):
+        """Return feedback of guess index against every code.
+
+        Rows are cached only for code spaces of at most TABLE_LIMIT codes.
+
+        """
+        row = self.table.get(guess)
+        if row is not None:
+            return row
+
+        if self.matrix is None:
+            self.matrix = code_matrix(range(self.size), self.pattern_length, self.base)
+
+        row = array('B', score_keys(self.to_digits(guess), self.matrix, self.base))
+
+        if self.size <= TABLE_LIMIT:
+            self.table[guess] = row
+        return row
+
+
+    def filter(self, candidates, guess, key):
+        """Return candidate indices which give encoded feedback key for guess."""
+        if self.size <= TABLE_LIMIT:
+            row = self.feedback_row(guess)
+            return array('I', [secret for secret in candidates if row[secret] == key])
+
+        return array('I', filter_codes(self.to_digits(guess), candidates, key,
+            self.pattern_length, self.base))
+
+
+    def partition(self, candidates, guess):
+        """Return candidate indices grouped by the encoded feedback they give
+        for guess."""
+        if self.size <= TABLE_LIMIT:
+            row = self.feedback_row(guess)
+            keys = [row[secret] for secret in candidates]
+        else:
+            keys = score_keys(self.to_digits(guess),
+                    code_matrix(candidates, self.pattern_length, self.base), self.base)
+
+        partitions = {}
+        for secret, key in zip(candidates, keys):
+            partitions.setdefault(int(key), array('I')).append(secret)
+        return partitions
+
+
+    def all_codes(self):
+        """Return indices of every code."""
+        return array('I', range(self.size))
+
+
+    def arrangement_count(self, colours):
+        """Return number of distinct arrangements of given colours.
+
+        >>> CodeSpace(4, ['r', 'g', 'b']).arrangement_count(['r', 'r', 'g', 'b'])
+        12
+
+        """
+        count = math.factorial(len(colours))
+        for colour in set(colours):
+            count //= math.factorial(list(colours).count(colour))
+        return count
+
+
+    def arrangements(self, colours):
+        """Return indices of every distinct arrangement of given colours."""
+        counts = [0] * self.base
+        for colour in colours:
+            counts[self.colour_digits[colour]] += 1
+
+        codes = array('I')
+
+        def arrange(index, remaining):
+            """Append every arrangement of the remaining pegs to codes."""
+            if remaining == 0:
+                codes.append(index)
+                return
+            for digit in range(self.base):
+                if counts[digit]:
+                    counts[digit] -= 1
+                    arrange(index * self.base + digit, remaining - 1)
+                    counts[digit] += 1
+
+        arrange(0, self.pattern_length)
+        return codes
+
+
+code_spaces = {}
+
+def get_code_space(pattern_length, pattern_colours):
+    """Return shared CodeSpace of given rules, creating it if needed.
+
+    Sharing lets the cached feedback table outlive single games.
+
+    """
+    key = (pattern_length, ''.join(pattern_colours))
+    if key not in code_spaces:
+        code_spaces[key] = CodeSpace(pattern_length, pattern_colours)
+    return code_spaces[key]
+
+
+class CandidateSet(object):
+
+    """Codes of a CodeSpace still consistent with the feedback so far.
+
+    Survivors are kept as an array of code indices, narrowed in place on
+    every feedback, alongside a bitset of one bit per code for membership
+    tests.
+
+    """
+
+    def __init__(self, code_space, codes=None):
+        self.code_space = code_space
+        if codes is None:
+            codes = code_space.all_codes()
+        self.codes = array('I', codes)
+
+        self.bits = bytearray((code_space.size + 7) // 8)
+        for code in self.codes:
+            self.bits[code >> 3] |= 1 << (code & 7)
+
+
+    def __len__(self):
+        return len(self.codes)
+
+
+    def __iter__(self):
+        return iter(self.codes)
+
+
+    def __getitem__(self, index):
+        return self.codes[index]
+
+
+    def __contains__(self, code):
+        return bool(self.bits[code >> 3] & (1 << (code & 7)))
+
+
+    def narrow(self, guess, key):
+        """Keep only codes which give encoded feedback key for guess."""
+        for code in self.codes:
+            self.bits[code >> 3] &= ~(1 << (code & 7)) & 0xff
+
+        self.codes = self.code_space.filter(self.codes, guess, key)
+        for code in self.codes:
+            self.bits[code >> 3] |= 1 << (code & 7)
+
+
+    def pop(self):
+        """Remove and return last code."""
+        code = self.codes.pop()
+        self.bits[code >> 3] &= ~(1 << (code & 7)) & 0xff
+        return code
@@ -6,34 +6,52 @@ Inherits from the Player class.
 
 import random
 import sys
-import time
 
+from code_space import CandidateSet
+from guess_strategies import FULL_SEARCH_LIMIT, KEEP_LIMIT, SAMPLE_RUN, SAMPLE_SIZE, STRATEGIES, choose_guess
+from instrumentation import ENABLED, count, timed
+from opening_book import get_opening
+from pacing import get_clock
 from player import Player
-from solving_algorithm import generate_solutions
+from solving_algorithm import cached_solutions, first_solutions, sample_solutions
 
 class ComputerPlayer(Player):
 
     """Mastermind ComputerPlayer class."""
 
-    def __init__(self):
+    __slots__ = ('pause', 'clock', 'quiet', 'strategy', 'indexed', 'solutions', 'colours_tried',
+            'solving_phase', 'candidates', 'history', 'opening')
+
+    names = ('Chell', 'GLaDOS', 'Curiosity Core', 'Turret', 'Companion Cube',
+            'Wheatley', 'Cave Johnson', 'Caroline', 'Cake')  # Shared by all
+
+    def __init__(self, indexed=False, strategy=None, quiet=False, clock=None):
         super(ComputerPlayer, self).__init__()  # Invoke parent __init__()
 
+        if strategy is not None and strategy not in STRATEGIES:
+            raise ValueError("Unknown strategy: %s" % strategy)
+
         self.pause = 0.1
-        self.names = ['Chell', 'GLaDOS', 'Curiosity Core', 'Turret',
-                'Companion Cube', 'Wheatley', 'Cave Johnson', 'Caroline',
-                'Cake']
+        self.clock = clock  # Pacing of typing, else the default clock
+        self.quiet = quiet  # Skip typing on terminal, e.g. in simulations
+        self.strategy = strategy  # Guess selection strategy, see guess_strategies
+        self.indexed = indexed or strategy is not None  # Solve with the integer-encoded code space
 
 
     def __type(self, message):
         """Simulate typing on terminal."""
+        if self.quiet:
+            return
+
+        clock = get_clock(self.clock)
         sys.stdout.write(' ')
         sys.stdout.flush()
-        time.sleep(self.pause * 5)
+        clock.sleep(self.pause * 5)
         for character in message:
             sys.stdout.write(character)
             sys.stdout.flush()
-            time.sleep(self.pause)
-        time.sleep(self.pause * 5)
+            clock.sleep(self.pause)
+        clock.sleep(self.pause * 5)
         print
 
 
@@ -43,6 +61,54 @@ class ComputerPlayer(Player):
         self.colours_tried = 0
         self.solving_phase = '1'
 
+        self.candidates = None
+        self.history = []
+
+        if self.strategy:
+            self.opening = get_opening(self.strategy, self.pattern_length, self.pattern_colours)
+
+            # Search from the first turn, keeping every code of small code spaces
+            self.solving_phase = '3'
+            if self.code_space.size <= FULL_SEARCH_LIMIT:
+                self.candidates = CandidateSet(self.code_space)
+
+
+    def __history_patterns(self):
+        """Return history as (guess, feedback) patterns."""
+        patterns = []
+        for guess, key in self.history:
+            blacks, whites = self.code_space.split_key(key)
+            patterns.append((self.code_space.decode(guess), ['b'] * blacks + ['w'] * whites))
+        return patterns
+
+
+    def __few_arrangements(self):
+        """Return whether the arrangements of the found colours are few
+        enough to keep as candidates."""
+        return self.code_space.arrangement_count(self.solutions) <= KEEP_LIMIT
+
+
+    def __consistent_codes(self):
+        """Return candidates, else a random sample of the codes consistent
+        with history, keeping them all as candidates once the sample shows
+        few are left."""
+        if self.candidates is not None:
+            return self.candidates
+
+        patterns = self.__history_patterns()
+        solutions = sample_solutions(patterns, self.pattern_length, self.pattern_colours,
+                SAMPLE_SIZE, SAMPLE_RUN)
+
+        # Sample repeated codes, so enumerate them all
+        if len(solutions) < SAMPLE_SIZE:
+            solutions = first_solutions(patterns, self.pattern_length, self.pattern_colours,
+                    KEEP_LIMIT + 1)
+            if len(solutions) <= KEEP_LIMIT:
+                self.candidates = CandidateSet(self.code_space,
+                        [self.code_space.encode(solution) for solution in solutions])
+                return self.candidates
+        return [self.code_space.encode(solution) for solution in solutions]
+
 
     def ask_for_name(self, message=''):
         """Set player name."""
@@ -55,10 +121,11 @@ class ComputerPlayer(Player):
 
     def choose_secret_pattern(self, message=''):
         """Set secret pattern."""
-        self.secret_pattern = []
+        secret_pattern = []
 
         for colour in range(self.pattern_length):  # Choose pattern randomly
-            self.secret_pattern.append(random.choice(self.pattern_colours))
+            secret_pattern.append(random.choice(self.pattern_colours))
+        self.secret_pattern = secret_pattern
 
         if message:
             print message.rstrip(),
@@ -67,6 +134,16 @@ class ComputerPlayer(Player):
 
     def make_guess(self, message='', allow_save=False):
         """Set guess."""
+        self.__choose_guess()
+
+        if message:
+            print message.rstrip(),
+        self.__type(''.join(self.guess))
+
+
+    @timed('computer guess, phase %s', 'solving_phase')
+    def __choose_guess(self):
+        """Set guess of the current solving phase."""
         self.guess = []
 
         # Try each colour to determine secret pattern colours
@@ -80,19 +157,32 @@ class ComputerPlayer(Player):
             for colour in self.solutions:
                 self.guess.append(colour)
 
-        # Choose guess from solutions
+        # Choose guess by strategy, looking it up in the opening book first
+        elif self.solving_phase == '3' and self.strategy:
+            guess = self.opening.get(tuple(self.history))
+            if guess is None:
+                guess = choose_guess(self.code_space, self.__consistent_codes(), self.strategy,
+                        self.history)
+            for colour in self.code_space.decode(guess):
+                self.guess.append(colour)
+
+        # Choose guess from solutions, else the first consistent with history
         elif self.solving_phase == '3':
-            solution = self.solutions.pop()
+            if self.candidates is not None:
+                solution = self.code_space.decode(self.candidates.pop())
+            else:
+                solution = first_solutions(self.__history_patterns(), self.pattern_length,
+                        self.pattern_colours)[0]
             for colour in solution:
                 self.guess.append(colour)
 
-        if message:
-            print message.rstrip(),
-        self.__type(''.join(self.guess))
-
 
+    @timed('computer analyse_feedback, phase %s', 'solving_phase')
     def analyse_feedback(self, feedback):
         """Analyse given feedback to improve guesses."""
+        self.history.append((self.code_space.encode(self.guess),
+                self.code_space.key_of(feedback)))
+
         # Check colour feedback
         if self.solving_phase == '1':
             colour = self.guess[0]
@@ -110,21 +200,27 @@ class ComputerPlayer(Player):
             if len(self.solutions) == self.pattern_length:
                 self.solving_phase = '2'
 
+                # Every arrangement of the found colours is still possible
+                if self.indexed and self.__few_arrangements():
+                    self.candidates = CandidateSet(self.code_space,
+                            self.code_space.arrangements(self.solutions))
+
         # Generate initial solutions
-        elif self.solving_phase == '2':
-            self.solutions = generate_solutions(self.guess, feedback)
+        elif self.solving_phase == '2' and not self.indexed:
+            if self.__few_arrangements():
+                solutions = cached_solutions(self.guess, feedback)
+                self.candidates = CandidateSet(self.code_space,
+                        [self.code_space.encode(solution) for solution in solutions])
             self.solving_phase = '3'
 
-        # Refine solutions
-        elif self.solving_phase == '3':
-            new_solutions = generate_solutions(self.guess, feedback)
-
-            # Get recurring solutions
-
-            current_solutions = set(map(tuple, self.solutions))
-            new_solutions = set(map(tuple, new_solutions))
+        # Narrow solutions down by feedback of guess
+        elif self.candidates is not None:
+            self.candidates.narrow(*self.history[-1])
+            self.solving_phase = '3'
 
-            solutions = current_solutions & new_solutions  # Set intersection
-            solutions = map(list, list(solutions))
+        # Too many arrangements to keep, each guess is enumerated from history
+        else:
+            self.solving_phase = '3'
 
-            self.solutions = solutions
+        if ENABLED and self.candidates is not None and self.solving_phase == '3':
+            count('computer candidates per turn', len(self.candidates))
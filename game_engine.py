@@ -0,0 +1,226 @@
+"""Headless game engine of the Mastermind project.
+
+Holds the rules and state of a game set and moves it through explicit
+transitions, without any input or output:
+
+    engine.start(codemaker, codebreaker)     phase 'secret'
+    engine.submit_secret(pattern)            phase 'guess'
+    engine.submit_guess(pattern)             feedback; phase 'guess' or 'over'
+    engine.next_game()                       roles swapped, phase 'secret',
+                                             or phase 'done' after the last
+
+The text game, the GUI and the simulations are front-ends that ask players
+for patterns and show what the engine returns. Feedback always uses the
+keys of FEEDBACK_KEYS; front-ends map them to what they display.
+
+"""
+
+import random
+
+COLOUR_CODES = ['r', 'g', 'b', 'c', 'm', 'y', 'o', 'p']
+FEEDBACK_KEYS = {'correct': 'b', 'partially_correct': 'w'}
+TURNS = 12
+
+SECRET = 'secret'  # Waiting for the codemaker's secret pattern
+GUESS = 'guess'    # Waiting for the codebreaker's guess
+OVER = 'over'      # Game over, solved or out of turns
+DONE = 'done'      # Game set over
+
+def decide_roles(player1, player2):
+    """Return codemaker and codebreaker, decided randomly."""
+    players = [player1, player2]
+    random.shuffle(players)
+
+    codemaker = players.pop()
+    codebreaker = players.pop()
+
+    return codemaker, codebreaker
+
+
+def computer_turn(engine):
+    """Let the computer codebreaker of engine play a turn; return turn,
+    guess and feedback."""
+    codebreaker = engine.codebreaker
+    turn = engine.current_turn
+    codebreaker.make_guess()
+    feedback = engine.submit_guess(codebreaker.guess)
+    return turn, codebreaker.guess, feedback
+
+
+class GameEngine(object):
+
+    """Mastermind GameEngine class."""
+
+    def __init__(self, games=2, length=4, colours=COLOUR_CODES[:6], turns=TURNS):
+        self.games = games
+        self.length = length
+        self.colours = list(colours)
+        self.turns = turns
+
+        self.guesses = {}
+        self.feedback = {}
+
+        self.codemaker = None
+        self.codebreaker = None
+        self.current_game = 0
+        self.current_turn = 0  # Turns played in the current game
+        self.phase = None
+
+
+    def start(self, codemaker, codebreaker):
+        """Start game set with given roles."""
+        self.codemaker = codemaker
+        self.codebreaker = codebreaker
+        codemaker.remember_rules(self.length, self.colours)
+        codebreaker.remember_rules(self.length, self.colours)
+
+        self.current_game = 0
+        self.start_game()
+
+
+    def start_game(self):
+        """Start current game."""
+        self.guesses[str(self.current_game)] = []
+        self.feedback[str(self.current_game)] = []
+        self.current_turn = 0
+
+        self.codemaker.ready_for_game()
+        self.codebreaker.ready_for_game()
+        self.phase = SECRET
+
+
+    def is_valid(self, pattern):
+        """Return True if pattern fits the rules, else False."""
+        if len(pattern) != self.length:
+            return False
+        for colour in pattern:
+            if colour not in self.colours:
+                return False
+        return True
+
+
+    def submit_secret(self, pattern):
+        """Set codemaker's secret pattern."""
+        if self.phase != SECRET:
+            raise ValueError("Not waiting for a secret pattern")
+        if not self.is_valid(pattern):
+            raise ValueError("Invalid secret pattern: %s" % ''.join(pattern))
+
+        self.codemaker.secret_pattern = list(pattern)
+        self.phase = GUESS
+
+
+    def submit_guess(self, pattern):
+        """Play codebreaker's guess; return its feedback.
+
+        The codemaker scores a point for every wrong guess, and an extra
+        point if the last turn is wrong too.
+
+        """
+        if self.phase != GUESS:
+            raise ValueError("Not waiting for a guess")
+        if not self.is_valid(pattern):
+            raise ValueError("Invalid guess: %s" % ''.join(pattern))
+
+        codemaker = self.codemaker
+        codebreaker = self.codebreaker
+        guess = list(pattern)
+        codebreaker.guess = guess
+
+        codemaker.prepare_feedback(guess, FEEDBACK_KEYS)
+        feedback = codemaker.feedback
+        solved = codemaker.is_correct(guess)
+        if not solved:
+            codebreaker.analyse_feedback(feedback)
+            codemaker.gain_point()
+            if self.is_last_turn():
+                codemaker.gain_point()
+
+        self.guesses[str(self.current_game)].append(guess)
+        self.feedback[str(self.current_game)].append(feedback)
+        self.current_turn += 1
+        if solved or self.current_turn == self.turns:
+            self.phase = OVER
+        return feedback
+
+
+    def next_game(self):
+        """Swap roles and start next game, else end game set."""
+        if self.is_last_game():
+            self.phase = DONE
+            return
+
+        self.codemaker, self.codebreaker = self.codebreaker, self.codemaker
+        self.current_game += 1
+        self.start_game()
+
+
+    def is_last_turn(self):
+        """Return True if last turn, else False."""
+        return self.current_turn == self.turns - 1
+
+
+    def is_last_game(self):
+        """Return True if last game, else False."""
+        return self.current_game == self.games - 1
+
+
+    def is_solved(self):
+        """Return True if the current game is solved, else False."""
+        feedback = self.feedback.get(str(self.current_game))
+        return bool(feedback) and feedback[-1] == [FEEDBACK_KEYS['correct']] * self.length
+
+
+    def turns_to_solve(self):
+        """Return number of turns the current game took to solve, else
+        None."""
+        if self.is_solved():
+            return self.current_turn
+
+
+    def winner(self):
+        """Return player with the higher score, else None on a tie."""
+        if self.codemaker.score > self.codebreaker.score:
+            return self.codemaker
+        elif self.codebreaker.score > self.codemaker.score:
+            return self.codebreaker
+
+
+    def state(self):
+        """Return state of game set, as saved."""
+        return {
+                'games': self.games,
+                'length': self.length,
+                'turns': self.turns,
+                'colours': self.colours,
+                'current_game': self.current_game,
+                'current_turn': self.current_turn,
+                'guesses': self.guesses,
+                'feedback': self.feedback,
+                'codemaker': self.codemaker,
+                'codebreaker': self.codebreaker
+                }
+
+
+    def restore(self, state):
+        """Restore game set state, as saved."""
+        self.games = state['games']
+        self.length = state['length']
+        self.turns = state['turns']
+        self.colours = list(state['colours'])
+
+        self.guesses = state['guesses']
+        self.feedback = state['feedback']
+
+        self.codemaker = state['codemaker']
+        self.codebreaker = state['codebreaker']
+        self.current_game = state['current_game']
+        self.current_turn = len(self.guesses.setdefault(str(self.current_game), []))
+        self.feedback.setdefault(str(self.current_game), [])
+
+        if not getattr(self.codemaker, 'secret_pattern', None):
+            self.phase = SECRET
+        elif self.is_solved() or self.current_turn == self.turns:
+            self.phase = OVER
+        else:
+            self.phase = GUESS
@@ -0,0 +1,357 @@
+"""Multi-session game server of the Mastermind project.
+
+Hosts many independent games from one process, over TCP or a Unix socket:
+    $ ./mastermind.py --serve [host:port|socket path] [workers]
+
+Every connection is a session against computer players, speaking a line
+protocol (client commands are case-insensitive, patterns are colour codes
+such as rgby):
+
+    server                                  client
+    MASTERMIND 1
+    MENU name|play|watch|quit
+                                            NAME Ann
+                                            PLAY [games] [pegs] [colours] [strategy]
+    GAME 1/2 CODEMAKER Ann CODEBREAKER Chell
+    SECRET?                                 rgby
+    GUESS 1 rrgg
+    FEEDBACK 1 bw                           (- for none)
+    ...
+    SOLVED 4 / FAILED rgby
+    SCORE Ann 3 Chell 0
+    GUESS? 1/12                             rrgg
+    ...
+    WINNER Ann / TIE
+    MENU name|play|watch|quit
+
+WATCH plays a duel between two computer players. Invalid input gets an
+ERROR line and the prompt again.
+
+The server runs on asyncore. Computer turns, whose solver can take long on
+the larger game sets, are run by a pool of worker threads, and their
+results are handed back to the event loop through a pipe, so that no
+session waits for another.
+
+"""
+
+import asynchat
+import asyncore
+import errno
+import os
+import Queue
+import socket
+import traceback
+from multiprocessing.pool import ThreadPool
+
+from computer_player import ComputerPlayer
+from game_engine import COLOUR_CODES, GUESS, OVER, SECRET, TURNS, GameEngine, computer_turn, decide_roles
+from guess_strategies import STRATEGIES
+from player import Player
+
+PROTOCOL_VERSION = 1
+ADDRESS = 'localhost:4040'
+WORKERS = 4  # Threads running computer turns
+MAX_LINE = 1024
+
+MENU = "MENU name|play|watch|quit"
+
+def parse_address(text):
+    """Return socket family and address of host:port, else of a Unix
+    socket path."""
+    if ':' in text:
+        host, port = text.rsplit(':', 1)
+        return socket.AF_INET, (host or 'localhost', int(port))
+    return socket.AF_UNIX, text
+
+
+def show_pattern(pattern):
+    """Return pattern, or feedback, as a protocol word."""
+    return ''.join(pattern) or '-'
+
+
+class Completions(asyncore.file_dispatcher):
+
+    """Hands results of worker threads back to the event loop."""
+
+    def __init__(self, map=None):
+        self.done = Queue.Queue()
+        self.wake_read, self.wake_write = os.pipe()
+        asyncore.file_dispatcher.__init__(self, self.wake_read, map)
+
+
+    def writable(self):
+        return False
+
+
+    def put(self, callback, result, error):
+        """Queue callback with result of a worker thread, waking the loop."""
+        self.done.put((callback, result, error))
+        os.write(self.wake_write, 'x')
+
+
+    def handle_read(self):
+        """Run queued callbacks in the event loop."""
+        try:
+            self.recv(MAX_LINE)
+        except OSError as error:
+            if error.errno != errno.EAGAIN:
+                raise
+        while True:
+            try:
+                callback, result, error = self.done.get_nowait()
+            except Queue.Empty:
+                break
+            callback(result, error)
+
+
+class Session(asynchat.async_chat):
+
+    """One client's session: menus and games against computer players."""
+
+    def __init__(self, sock, server):
+        asynchat.async_chat.__init__(self, sock, map=server.map)
+        self.server = server
+        self.set_terminator('\n')
+        self.buffer = []
+
+        self.human = Player()
+        self.human.name = 'Player'
+        self.engine = None
+        self.state = 'menu'  # menu, secret, guess or busy
+
+        self.send_line("MASTERMIND %d" % PROTOCOL_VERSION)
+        self.send_line(MENU)
+
+
+    def send_line(self, line):
+        """Queue line to the client."""
+        self.push(line + '\r\n')
+
+
+    def collect_incoming_data(self, data):
+        self.buffer.append(data)
+        if sum(len(part) for part in self.buffer) > MAX_LINE:  # Misbehaving client
+            self.close_when_done()
+
+
+    def found_terminator(self):
+        line = ''.join(self.buffer).strip()
+        self.buffer = []
+        if line:
+            self.handle_line(line)
+
+
+    def handle_line(self, line):
+        """Act on a line from the client."""
+        words = line.split()
+        command = words[0].lower()
+
+        if command == 'quit':
+            self.send_line("BYE")
+            self.close_when_done()
+        elif self.state == 'busy':
+            self.send_line("ERROR Wait for the computer")
+        elif self.state == 'secret':
+            self.submit_secret(line.lower())
+        elif self.state == 'guess':
+            self.submit_guess(line.lower())
+        elif command == 'name' and len(words) > 1:
+            self.human.name = ' '.join(words[1:])[:15].capitalize()
+            self.send_line("NAME %s" % self.human.name)
+        elif command in ('play', 'watch'):
+            self.start(command, words[1:])
+        else:
+            self.send_line("ERROR Unknown command")
+            self.send_line(MENU)
+
+
+    def start(self, command, options):
+        """Start game set of given options."""
+        try:
+            games = int(options[0]) if len(options) > 0 else 2
+            length = int(options[1]) if len(options) > 1 else 4
+            colours = int(options[2]) if len(options) > 2 else 6
+        except ValueError:
+            self.send_line("ERROR Options must be numbers")
+            return
+        strategy = options[3].lower() if len(options) > 3 else None
+        if not (1 <= games <= 100 and 3 <= length <= 8 and 3 <= colours <= 8):
+            self.send_line("ERROR Use 1-100 games, 3-8 pegs and 3-8 colours")
+            return
+        if strategy is not None and strategy not in STRATEGIES:
+            self.send_line("ERROR Unknown strategy: %s" % strategy)
+            return
+
+        computer = ComputerPlayer(strategy=strategy, quiet=True)
+        computer.ask_for_name()
+        if command == 'watch':
+            opponent = ComputerPlayer(strategy=strategy, quiet=True)
+            opponent.ask_for_name()
+        else:
+            self.human.score = 0
+            opponent = self.human
+
+        codemaker, codebreaker = decide_roles(opponent, computer)
+        self.engine = GameEngine(games, length, COLOUR_CODES[:colours], TURNS)
+        self.engine.start(codemaker, codebreaker)
+        self.announce_game()
+        self.advance()
+
+
+    def announce_game(self):
+        """Send header of the current game."""
+        engine = self.engine
+        self.send_line("GAME %d/%d CODEMAKER %s CODEBREAKER %s" % (engine.current_game + 1,
+                engine.games, engine.codemaker.name, engine.codebreaker.name))
+
+
+    def advance(self):
+        """Play the game set on until it waits for the client or a worker."""
+        engine = self.engine
+        while True:
+            if engine.phase == SECRET:
+                if engine.codemaker is self.human:
+                    self.state = 'secret'
+                    self.send_line("SECRET?")
+                    return
+                engine.codemaker.choose_secret_pattern()
+                engine.submit_secret(engine.codemaker.secret_pattern)
+
+            elif engine.phase == GUESS:
+                if engine.codebreaker is self.human:
+                    self.state = 'guess'
+                    self.send_line("GUESS? %d/%d" % (engine.current_turn + 1, engine.turns))
+                else:
+                    self.state = 'busy'
+                    self.server.run(computer_turn, (engine,), self.computer_turn_done)
+                return
+
+            elif engine.phase == OVER:
+                if engine.is_solved():
+                    self.send_line("SOLVED %d" % engine.turns_to_solve())
+                else:
+                    self.send_line("FAILED %s" % show_pattern(engine.codemaker.secret_pattern))
+                self.send_line("SCORE %s %d %s %d" % (engine.codemaker.name, engine.codemaker.score,
+                        engine.codebreaker.name, engine.codebreaker.score))
+
+                if engine.is_last_game():
+                    winner = engine.winner()
+                    self.send_line("WINNER %s" % winner.name if winner else "TIE")
+                    self.engine = None
+                    self.state = 'menu'
+                    self.send_line(MENU)
+                    return
+                engine.next_game()
+                self.announce_game()
+
+
+    def submit_secret(self, line):
+        """Set the client's secret pattern."""
+        pattern = list(line)
+        if not self.engine.is_valid(pattern):
+            self.send_line("ERROR Use %d of %s" % (self.engine.length, ''.join(self.engine.colours)))
+            self.send_line("SECRET?")
+            return
+        self.engine.submit_secret(pattern)
+        self.advance()
+
+
+    def submit_guess(self, line):
+        """Play the client's guess."""
+        engine = self.engine
+        pattern = list(line)
+        if not engine.is_valid(pattern):
+            self.send_line("ERROR Use %d of %s" % (engine.length, ''.join(engine.colours)))
+            self.send_line("GUESS? %d/%d" % (engine.current_turn + 1, engine.turns))
+            return
+        turn = engine.current_turn
+        self.send_line("FEEDBACK %d %s" % (turn + 1, show_pattern(engine.submit_guess(pattern))))
+        self.advance()
+
+
+    def computer_turn_done(self, result, error):
+        """Send computer turn played by a worker, and play on."""
+        if not self.connected:  # Client left meanwhile
+            return
+        if error:
+            self.send_line("ERROR Computer player failed")
+            self.engine = None
+            self.state = 'menu'
+            self.send_line(MENU)
+            return
+
+        turn, guess, feedback = result
+        self.send_line("GUESS %d %s" % (turn + 1, show_pattern(guess)))
+        self.send_line("FEEDBACK %d %s" % (turn + 1, show_pattern(feedback)))
+        self.advance()
+
+
+    def handle_error(self):
+        traceback.print_exc()
+        self.close()
+
+
+class GameServer(asyncore.dispatcher):
+
+    """Listening socket creating a Session per connection."""
+
+    def __init__(self, address=ADDRESS, workers=WORKERS):
+        self.map = {}
+        asyncore.dispatcher.__init__(self, map=self.map)
+
+        family, self.address = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.remove(self.address)  # Left by an earlier server
+        self.create_socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.set_reuse_addr()
+        self.bind(self.address)
+        self.listen(64)
+
+        self.completions = Completions(self.map)
+        self.pool = ThreadPool(workers)
+
+
+    def run(self, function, args, callback):
+        """Run function in a worker thread, then callback with its result
+        and error in the event loop."""
+
+        def work():
+            try:
+                result = function(*args)
+            except Exception:
+                self.completions.put(callback, None, traceback.format_exc())
+            else:
+                self.completions.put(callback, result, None)
+
+
+        self.pool.apply_async(work)
+
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            Session(pair[0], self)
+
+
+    def serve_forever(self):
+        """Serve sessions until interrupted."""
+        try:
+            asyncore.loop(timeout=1, use_poll=True, map=self.map)
+        finally:
+            self.shutdown()
+
+
+    def shutdown(self):
+        """Close every session and stop the workers."""
+        asyncore.close_all(self.map)
+        self.pool.terminate()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+def serve(address=ADDRESS, workers=WORKERS):
+    """Run game server on address."""
+    server = GameServer(address, workers)
+    print "Mastermind server listening on %s" % address
+    server.serve_forever()
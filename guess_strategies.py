@@ -0,0 +1,230 @@
+"""Guess selection strategies used in the Mastermind project.
+
+Every strategy scores a guess by how it partitions the codes which are still
+consistent with the feedback so far; the guess with the lowest score is made.
+
+    minimax     Knuth: size of the largest partition
+    partitions  number of partitions (more is better)
+    expected    expected size of the partition left after the guess
+    entropy     information gained by the guess (more is better)
+
+Guesses are scored against every candidate while the number of guess and
+candidate pairs stays within a limit, which is far lower without NumPy;
+beyond it, against a random sample of the candidates, and only a random
+sample of the guesses is scored.
+
+"""
+
+import math
+import random
+from itertools import imap, izip, product
+
+from batch_feedback import as_codes, code_matrix, colour_counts, count_keys, count_partitions, \
+        lookup_keys, numpy
+from code_space import TABLE_LIMIT, CandidateSet
+
+SEARCH_LIMIT = 2000000          # Most guess-candidate pairs scored per guess with NumPy
+SCORE_LIMIT = 20000             # Most guess-candidate pairs scored per guess without NumPy
+MIN_POOL = 20                   # Fewest guesses a sample of candidates leaves room for
+FULL_SEARCH_LIMIT = TABLE_LIMIT # Largest code space kept whole from the first turn
+KEEP_LIMIT = 1000               # Most consistent codes of larger spaces kept as candidates
+SAMPLE_SIZE = 100               # Consistent codes sampled while there are more
+SAMPLE_RUN = 5                  # Consecutive consistent codes taken per random enumeration
+CACHE_LIMIT = 100000            # Most guesses and pools remembered across games
+
+def minimax(sizes, total):
+    """Return size of the largest partition."""
+    return max(sizes)
+
+
+def max_partitions(sizes, total):
+    """Return negated number of partitions."""
+    return -len(sizes)
+
+
+def expected_size(sizes, total):
+    """Return expected size of the remaining partition."""
+    return sum(size * size for size in sizes) / float(total)
+
+
+def max_entropy(sizes, total):
+    """Return negated entropy of the partitions."""
+    return sum(size * math.log(size) for size in sizes) / total - math.log(total)
+
+
+STRATEGIES = {
+        'minimax': minimax,
+        'partitions': max_partitions,
+        'expected': expected_size,
+        'entropy': max_entropy
+        }
+
+guess_cache = {}
+pool_cache = {}
+
+def partition_sizes(code_space, guess, candidates, candidate_matrix, candidate_counts):
+    """Return sizes of the non-empty partitions guess splits candidates into.
+
+    Cached feedback rows are looked up, and with NumPy rows of small code
+    spaces are cached as needed; otherwise guess is scored against the
+    candidates only, given as a matrix of their colour digits and their
+    colour counts.
+
+    """
+    row = code_space.table.get(guess)
+    if row is None and numpy is not None and code_space.size <= TABLE_LIMIT:
+        row = code_space.feedback_row(guess)
+
+    if row is not None:
+        counts = count_keys(lookup_keys(row, candidates), (code_space.pattern_length + 1) ** 2)
+    else:
+        counts = count_partitions(code_space.to_digits(guess), candidate_matrix, candidate_counts,
+                code_space.base)
+    return [int(count) for count in counts if count]
+
+
+def symmetries(code_space, history):
+    """Return colour digits no guess in history used, which are still
+    interchangeable, and classes of positions every guess in history has
+    the same colours at, whose pegs are still interchangeable."""
+    guesses = [code_space.to_digits(guess) for guess, key in history]
+
+    used = set(digit for guess in guesses for digit in guess)
+    free_colours = [digit for digit in range(code_space.base) if digit not in used]
+
+    classes = {}
+    for position in range(code_space.pattern_length):
+        column = tuple(guess[position] for guess in guesses)
+        classes.setdefault(column, []).append(position)
+    return free_colours, sorted(classes.values())
+
+
+def representative(digits, free_colours, position_classes):
+    """Return digits of a code equivalent to digits under the symmetries.
+
+    Free colours are renamed by descending count, then first appearance,
+    and pegs are sorted within every position class. Equivalent codes
+    usually, but not always, get the same representative.
+
+    """
+    free = set(free_colours)
+    rename = len(free_colours) > 1
+    classes = [positions for positions in position_classes if len(positions) > 1]
+
+    digits = list(digits)
+    for step in range(2 if rename and classes else 1):  # Either alone is settled at once
+        if rename:
+            counts = {}
+            order = []  # Free colours by first appearance
+            for digit in digits:
+                if digit in free:
+                    if digit not in counts:
+                        counts[digit] = 0
+                        order.append(digit)
+                    counts[digit] += 1
+            order.sort(key=counts.get, reverse=True)  # Stable, so ties keep their order
+            names = dict(zip(order, free_colours))
+            digits = [names.get(digit, digit) for digit in digits]
+
+        for positions in classes:
+            pegs = sorted(digits[position] for position in positions)
+            for position, peg in zip(positions, pegs):
+                digits[position] = peg
+    return tuple(digits)
+
+
+def reduce_pool(code_space, pool, history):
+    """Return one code of pool per class of codes the symmetries left by
+    history make equivalent as guesses."""
+    free_colours, position_classes = symmetries(code_space, history)
+    if len(free_colours) < 2 and len(position_classes) == code_space.pattern_length:
+        return pool  # No symmetry left
+
+    if isinstance(pool, xrange) and len(pool) == code_space.size:  # Every code, in order
+        digits = product(range(code_space.base), repeat=code_space.pattern_length)
+    else:
+        digits = imap(code_space.to_digits, pool)
+
+    seen = set()
+    reduced = []
+    for code, code_digits in izip(pool, digits):
+        key = representative(code_digits, free_colours, position_classes)
+        if key not in seen:
+            seen.add(key)
+            reduced.append(code)
+    return reduced
+
+
+def guess_pool(code_space, candidates, history=()):
+    """Return codes worth scoring as the next guess: every code of a code
+    space small enough for a feedback table, else every candidate, in both
+    cases reduced by symmetry.
+
+    Pools of every code depend only on the symmetries history leaves, so
+    they are remembered across games.
+
+    """
+    if code_space.size > TABLE_LIMIT:
+        return reduce_pool(code_space, candidates, history)
+
+    free_colours, position_classes = symmetries(code_space, history)
+    key = (code_space.pattern_length, ''.join(code_space.pattern_colours),
+            tuple(free_colours), tuple(map(tuple, position_classes)))
+    if key not in pool_cache:
+        if len(pool_cache) >= CACHE_LIMIT:
+            pool_cache.clear()
+        pool_cache[key] = reduce_pool(code_space, xrange(code_space.size), history)
+    return pool_cache[key]
+
+
+def choose_guess(code_space, candidates, strategy, history=(), rng=random):
+    """Return index of best guess for candidates by given strategy.
+
+    history holds the (guess, feedback key) pairs which left candidates, so
+    a choice made once is reused by every later game with the same history.
+    Samples, when needed, are drawn with rng.
+
+    """
+    if len(candidates) <= 2:
+        return candidates[0]
+
+    cache_key = (code_space.pattern_length, ''.join(code_space.pattern_colours),
+            strategy, tuple(history))
+    if cache_key in guess_cache:
+        return guess_cache[cache_key]
+
+    score = STRATEGIES[strategy]
+    if isinstance(candidates, CandidateSet):
+        consistent = candidates
+        candidates = candidates.codes
+    else:
+        consistent = set(candidates)
+
+    # Score samples of candidates and guesses if all pairs are too many
+    limit = SEARCH_LIMIT if numpy is not None else SCORE_LIMIT
+    pool = guess_pool(code_space, candidates, history)
+    if len(pool) * len(candidates) > limit:
+        if len(candidates) * MIN_POOL > limit:
+            candidates = sorted(rng.sample(candidates, limit // MIN_POOL))
+        if len(pool) * len(candidates) > limit:
+            pool = sorted(rng.sample(pool, limit // len(candidates)))
+    total = len(candidates)
+
+    candidate_matrix = candidate_counts = None
+    if numpy is None or code_space.size > TABLE_LIMIT:  # Scored, not looked up
+        candidate_matrix = code_matrix(candidates, code_space.pattern_length, code_space.base)
+        candidate_counts = colour_counts(candidate_matrix, code_space.base)
+    candidate_codes = as_codes(candidates)
+
+    best = None
+    for guess in pool:
+        sizes = partition_sizes(code_space, guess, candidate_codes, candidate_matrix, candidate_counts)
+        # Prefer consistent guesses, which may be correct, on equal scores
+        rank = (score(sizes, total), guess not in consistent, guess)
+        if best is None or rank < best:
+            best = rank
+
+    if len(guess_cache) >= CACHE_LIMIT:
+        guess_cache.clear()
+    guess_cache[cache_key] = best[2]
+    return best[2]
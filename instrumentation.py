@@ -0,0 +1,126 @@
+"""Instrumentation of the Mastermind project.
+
+Opt-in timers and counters on the hot paths of a game: the solving phases
+of the ComputerPlayer, the steps of generate_solutions, feedback, board
+rendering and saving. Instrumentation is switched on by the environment,
+before the program starts:
+    $ MASTERMIND_STATS=1 ./mastermind.py ...             summary
+    $ MASTERMIND_STATS=game.prof ./mastermind.py ...     summary and cProfile
+                                                         output for pstats
+
+The summary is shown at exit, on Ctrl-C, and on SIGUSR1 while running;
+the profile is written at exit.
+
+Whether instrumentation is on is decided on import, so that when it is
+off timed returns functions undecorated and call sites skip counting
+behind a test of ENABLED: a game not instrumented runs as before.
+Counters are not locked, so counts from threads of the game server are
+approximate; cProfile only follows the main thread.
+
+"""
+
+import atexit
+import cProfile
+import functools
+import os
+import signal
+import sys
+import time
+
+SETTING = os.environ.get('MASTERMIND_STATS', '')
+ENABLED = bool(SETTING)
+PROFILE_NAME = SETTING if SETTING not in ('', '1') else None  # cProfile output
+
+timers = {}    # Calls and seconds by name
+counters = {}  # Events and total counted by name
+profiler = None
+
+def timed(name, attribute=None):
+    """Return decorator timing calls of a function under name, if enabled.
+
+    If attribute is given, name is formatted with that attribute of the
+    first argument (the instance) before the call, e.g. its solving phase.
+
+    """
+
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            timer_name = name % getattr(args[0], attribute, None) if attribute else name
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add_time(timer_name, time.time() - start)
+
+
+        return timed_function
+
+
+    return decorate
+
+
+def add_time(name, seconds):
+    """Add a call of given seconds to timer name."""
+    timer = timers.setdefault(name, [0, 0.0])
+    timer[0] += 1
+    timer[1] += seconds
+
+
+def count(name, value=1):
+    """Add an event of given value to counter name."""
+    counter = counters.setdefault(name, [0, 0])
+    counter[0] += 1
+    counter[1] += value
+
+
+def summary():
+    """Return summary of timers and counters as lines."""
+    lines = ["%-44s %10s %12s %12s" % ('timer', 'calls', 'total ms', 'mean us')]
+    for name, (calls, seconds) in sorted(timers.items()):
+        lines.append("%-44s %10d %12.2f %12.2f" % (name, calls, seconds * 1e3, seconds / calls * 1e6))
+    lines.append("%-44s %10s %12s %12s" % ('counter', 'events', 'total', 'mean'))
+    for name, (events, total) in sorted(counters.items()):
+        lines.append("%-44s %10d %12d %12.2f" % (name, events, total, float(total) / events))
+    return lines
+
+
+def show_summary(stream=None):
+    """Show summary on stream, standard error by default."""
+    stream = stream or sys.stderr
+    stream.write('\n'.join(summary()) + '\n')
+    stream.flush()
+
+
+def dump_profile():
+    """Write cProfile output to PROFILE_NAME, if profiling."""
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(PROFILE_NAME)
+
+
+def show_on_signal(signal_number, frame):
+    """Show summary while running."""
+    show_summary()
+
+
+def at_exit():
+    """Show summary and write profile."""
+    dump_profile()
+    show_summary()
+
+
+def start():
+    """Start profiling, and report at exit and on SIGUSR1, if enabled."""
+    global profiler
+    if not ENABLED:
+        return
+
+    if PROFILE_NAME:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    atexit.register(at_exit)
+    signal.signal(signal.SIGUSR1, show_on_signal)
@@ -0,0 +1,163 @@
+"""Append-only game journal of the Mastermind project.
+
+Autosaves a game set in progress at a constant cost per turn, so that it
+can be resumed after a crash or Ctrl-C. The journal is a sequence of
+records, each a type (B), a payload length (I), the payload and its CRC-32
+(I):
+    'S'  snapshot   a full save of the game set (see save_format)
+    'T'  turn       game (H), turn (B), guess code (I), feedback key (B),
+                    codemaker score (I), codebreaker score (I)
+
+Turn records are appended as they are played, and reach the disk with one
+fsync every few records. At the start of every game the journal is
+compacted: rewritten as a single snapshot holding the finished games.
+Reading stops at the first torn or corrupt record, so a crash while
+writing loses at most the turn being written.
+
+"""
+
+import os
+import struct
+import zlib
+
+from code_space import get_code_space
+from instrumentation import ENABLED, count, timed
+from save_format import pack_save, restore_players, unpack_feedback, unpack_state
+
+JOURNAL_NAME = 'autosave.jnl'
+SYNC_EVERY = 4  # Turn records per fsync
+
+RECORD = struct.Struct('<cI')
+CHECKSUM = struct.Struct('<I')
+TURN = struct.Struct('<HBIBII')
+
+def pack_record(kind, payload):
+    """Return record of given kind and payload."""
+    return RECORD.pack(kind, len(payload)) + payload + CHECKSUM.pack(zlib.crc32(payload) & 0xffffffff)
+
+
+def unpack_records(data):
+    """Yield (kind, payload) of every intact record of data."""
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        kind, length = RECORD.unpack_from(data, offset)
+        start = offset + RECORD.size
+        end = start + length
+        if end + CHECKSUM.size > len(data):  # Torn record
+            return
+        payload = data[start:end]
+        if CHECKSUM.unpack_from(data, end)[0] != zlib.crc32(payload) & 0xffffffff:
+            return
+        yield kind, payload
+        offset = end + CHECKSUM.size
+
+
+def read_journal(journal_name, feedback_keys):
+    """Return state of the game set in journal_name, else None."""
+    try:
+        journal_file = open(journal_name, 'rb')
+        try:
+            data = journal_file.read()
+        finally:
+            journal_file.close()
+    except IOError:
+        return
+
+    state = None
+    for kind, payload in unpack_records(data):
+        if kind == 'S':
+            state = unpack_state(payload, feedback_keys)
+            code_space = get_code_space(state['length'], state['colours'])
+        elif kind == 'T' and state:
+            game, turn, guess, key, codemaker_score, codebreaker_score = TURN.unpack(payload)
+            if game != state['current_game']:
+                continue
+            state['guesses'][str(game)].append(code_space.decode(guess))
+            state['feedback'][str(game)].append(unpack_feedback(code_space, key, feedback_keys))
+            state['codemaker'].score = codemaker_score
+            state['codebreaker'].score = codebreaker_score
+            state['current_turn'] = turn + 1
+            if key == code_space.feedback_key(state['length'], 0):  # Solved
+                state['current_turn'] = state['turns']
+
+    if state:
+        restore_players(state)
+    return state
+
+
+class Journal(object):
+
+    """Append-only journal of a game set in progress."""
+
+    def __init__(self, journal_name, sync_every=SYNC_EVERY):
+        self.journal_name = journal_name
+        self.sync_every = sync_every
+        self.fd = None
+        self.unsynced = 0
+
+
+    @timed('journal compact')
+    def compact(self, state):
+        """Rewrite journal as a snapshot of state.
+
+        The snapshot is written aside and renamed over the journal, so that
+        a crash leaves either the old journal or the new one.
+
+        """
+        self.close()
+        self.state = state
+        self.code_space = get_code_space(state['length'], state['colours'])
+
+        temporary_name = self.journal_name + '.tmp'
+        fd = os.open(temporary_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0644)
+        try:
+            record = pack_record('S', pack_save(state))
+            os.write(fd, record)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.rename(temporary_name, self.journal_name)
+        if ENABLED:
+            count('journal snapshot bytes', len(record))
+
+        self.fd = os.open(self.journal_name, os.O_WRONLY | os.O_APPEND)
+
+
+    @timed('journal record_turn')
+    def record_turn(self, turn, guess, feedback):
+        """Append turn of the current game, with the scores after it."""
+        state = self.state
+        payload = TURN.pack(state['current_game'], turn, self.code_space.encode(guess),
+                self.code_space.key_of(feedback), state['codemaker'].score, state['codebreaker'].score)
+        record = pack_record('T', payload)
+        os.write(self.fd, record)  # Unbuffered, so only power loss can lose it
+        if ENABLED:
+            count('journal turn bytes', len(record))
+
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+
+    def sync(self):
+        """Flush appended records to disk."""
+        if self.fd is not None and self.unsynced:
+            os.fsync(self.fd)
+            self.unsynced = 0
+
+
+    def close(self):
+        """Sync and close journal."""
+        if self.fd is not None:
+            self.sync()
+            os.close(self.fd)
+            self.fd = None
+
+
+    def remove(self):
+        """Close and delete journal, once its game set is over."""
+        self.close()
+        try:
+            os.remove(self.journal_name)
+        except OSError:
+            pass
@@ -5,13 +5,42 @@
 import signal
 import sys
 
+from game_server import ADDRESS, WORKERS, serve
+from guess_strategies import STRATEGIES
+from instrumentation import start as start_instrumentation
 from mastermind_game import MastermindGame
-from mastermind_gui import MastermindGUI
+from opening_book import build_book
+from pacing import PACINGS, SCALE, set_pacing
+from parallel_simulation import simulate_parallel, solve_all_parallel
+from simulation import show_report, simulate, solver_options
 from signal_handler import quit_game
 
+def show_usage():
+    """Show command line usage."""
+    print "Usage: %s [-t [real|scaled [factor]|instant]|-g|-b [strategy] [depth]" % sys.argv[0]
+    print "       |-s [games] [length] [colours] [seed] [solver]"
+    print "       |-p [workers] [games] [length] [colours] [seed] [solver]"
+    print "       |-x [workers] [length] [colours] [solver]"
+    print "       |--serve [host:port|socket path] [workers]]"
+    print "solver is classic, indexed (default) or a guess strategy"
+
+
+def int_argument(position, default):
+    """Return command line argument at position as an integer, else default;
+    raise ValueError if it is not one."""
+    return int(sys.argv[position]) if len(sys.argv) > position else default
+
+
+def valid_options(length, colours, strategy):
+    """Return whether a game set of given pegs and colours can be played by
+    strategy, as the game options allow."""
+    return 3 <= length <= 8 and 3 <= colours <= 8 and (strategy is None or strategy in STRATEGIES)
+
+
 def main():
     """Main program loop."""
     signal.signal(signal.SIGINT, quit_game)  # Exit gracefully
+    start_instrumentation()  # If asked for by MASTERMIND_STATS
 
     try:
         mode = sys.argv[1]
@@ -19,13 +48,84 @@ def main():
         mode = '-t'
 
     if mode == '-t':  # Text mode
+        if len(sys.argv) > 2:  # Pacing of pauses and computer typing
+            try:
+                factor = float(sys.argv[3]) if len(sys.argv) > 3 else SCALE
+            except ValueError:
+                factor = None
+            if sys.argv[2] not in PACINGS or factor is None:
+                show_usage()
+                return
+            set_pacing(sys.argv[2], factor)
         mastermind = MastermindGame()
         mastermind.main()
     elif mode == '-g':  # Graphical mode
+        from mastermind_gui import MastermindGUI  # Needs GTK, unlike the other modes
         mastermind_gui = MastermindGUI()
         mastermind_gui.main()
+    elif mode == '-b':  # Build opening book
+        strategy = sys.argv[2] if len(sys.argv) > 2 else 'minimax'
+        try:
+            depth = int_argument(3, 3)
+        except ValueError:
+            depth = None
+        if depth is None or strategy not in STRATEGIES:
+            show_usage()
+            return
+        build_book(strategy, depth)
+    elif mode == '-s':  # Headless simulation
+        try:
+            games = int_argument(2, 1000)
+            length = int_argument(3, 4)
+            colours = int_argument(4, 6)
+            seed = int_argument(5, None)
+        except ValueError:
+            show_usage()
+            return
+        strategy, indexed = solver_options(sys.argv[6] if len(sys.argv) > 6 else None)
+        if not valid_options(length, colours, strategy):
+            show_usage()
+            return
+        show_report(simulate(games, length, colours, seed, strategy, indexed=indexed))
+    elif mode == '-p':  # Parallel headless simulation
+        try:
+            workers = int_argument(2, None)
+            games = int_argument(3, 100000)
+            length = int_argument(4, 4)
+            colours = int_argument(5, 6)
+            seed = int_argument(6, None)
+        except ValueError:
+            show_usage()
+            return
+        strategy, indexed = solver_options(sys.argv[7] if len(sys.argv) > 7 else None)
+        if not valid_options(length, colours, strategy):
+            show_usage()
+            return
+        show_report(simulate_parallel(games, length, colours, seed, strategy, workers,
+                indexed=indexed))
+    elif mode == '-x':  # Solve every secret in parallel
+        try:
+            workers = int_argument(2, None)
+            length = int_argument(3, 4)
+            colours = int_argument(4, 6)
+        except ValueError:
+            show_usage()
+            return
+        strategy, indexed = solver_options(sys.argv[5] if len(sys.argv) > 5 else None)
+        if not valid_options(length, colours, strategy):
+            show_usage()
+            return
+        show_report(solve_all_parallel(length, colours, strategy, workers, indexed=indexed))
+    elif mode == '--serve':  # Game server
+        address = sys.argv[2] if len(sys.argv) > 2 else ADDRESS
+        try:
+            workers = int_argument(3, WORKERS)
+        except ValueError:
+            show_usage()
+            return
+        serve(address, workers)
     else:
-        print "Usage: %s [-t|-g]" % sys.argv[0]
+        show_usage()
 
 
 if __name__ == '__main__':
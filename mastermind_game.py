@@ -2,33 +2,41 @@
 
 import os
 import pickle
-import random
+import struct
 import sys
-import time
 
 from player import Player
 from computer_player import ComputerPlayer
 from board import Board
 from functions import is_odd
+from game_engine import FEEDBACK_KEYS, GUESS, SECRET, GameEngine, decide_roles
+from journal import JOURNAL_NAME, Journal, read_journal
+from pacing import get_clock
+from renderer import TerminalRenderer
+from save_format import read_save, write_save
+from save_index import describe_save, list_saves, read_index, save_path, update_index
 
 class MastermindGame(object):
 
     """MastermindGame class."""
 
-    def __init__(self):
+    def __init__(self, clock=None):
         self.pause = 2
+        self.clock = clock  # Pacing of pauses, else the default clock
+        self.renderer = TerminalRenderer()
         self.width = 80
 
         self.min = 3
         self.max = 8
 
         self.save_dir = 'saves'
+        self.journal_dir = 'autosave'  # Kept apart from the indexed saves
 
         self.modes = ['s', 'm', 'd', 'l', 'i', 'o', 'q']
         self.settings = {'g': 'games', 'p': 'length', 'c': 'colours', 'b': None}
 
         self.colour_codes = ['r', 'g', 'b', 'c', 'm', 'y', 'o', 'p']
-        self.feedback_keys = {'correct': 'b', 'partially_correct': 'w'}
+        self.feedback_keys = FEEDBACK_KEYS
 
         self.colour_names = {'r': 'red', 'g': 'green', 'b': 'blue', 'c': 'cyan', 'm': 'magenta', 'y': 'yellow', 'o': 'orange', 'p': 'purple'}
         self.feedback_names = {'b': 'black', 'w': 'white'} 
@@ -38,22 +46,23 @@ class MastermindGame(object):
         self.colours = 6
         self.turns = 12
 
-        self.guesses = {}
-        self.feedback = {}
+        self.engine = None  # Game set in play
+        self.journal = None
 
 
     def __clear(self):
         """Clear screen."""
-        os.system('clear')
+        self.renderer.clear()
 
 
     def __pause(self, pause):
         """Pause game."""
-        time.sleep(pause)
+        get_clock(self.clock).sleep(pause)
 
 
     def main(self):
         """Main game loop."""
+        self.resume_game()
         while True:
             mode = self.menu()
             if mode == 's':
@@ -187,7 +196,7 @@ class MastermindGame(object):
         sys.exit()
 
 
-    def save_game(self, codemaker, codebreaker):
+    def save_game(self):
         """Save game screen."""
         confirm = None
         while confirm != 'y' and confirm != 'n':  # Confirm saving
@@ -205,12 +214,9 @@ class MastermindGame(object):
             os.mkdir(self.save_dir)
 
         # Get saved games
-        saved_games = os.listdir(self.save_dir)
-        saved_names = list(saved_games)
-        if saved_games:
-            for i, saved_name in enumerate(saved_names):
-                saved_names[i] = saved_name.rstrip('.sav')
-            print "Saved games found:  %s" % '  '.join(saved_names)
+        saved_names = read_index(self.save_dir)['saves']
+        if saved_names:
+            print "Saved games found:  %s" % '  '.join(sorted(saved_names))
  
         save_name = None
         while not save_name:
@@ -237,8 +243,8 @@ class MastermindGame(object):
                 return
 
         # Save game
-        save_name = os.path.join(self.save_dir, save_name + '.sav')
-        self.save(save_name, codemaker, codebreaker)
+        if self.save(save_path(self.save_dir, save_name)):
+            update_index(self.save_dir, save_name)
 
 
     def load_game(self):
@@ -250,102 +256,116 @@ class MastermindGame(object):
         print "Searching saved games directory...\n"
 
         # Get saved games
-        saved_games = os.listdir(self.save_dir)
-        if not saved_games:
+        index = read_index(self.save_dir)
+        if not index['saves']:
             print "No saved games found. Aborting..."
             self.__pause(self.pause)
             return
 
-        # Show saved games
-        saved_names = list(saved_games)
-        for i, saved_name in enumerate(saved_names):
-            saved_names[i] = saved_name.rstrip('.sav')
-        print "Saved games found:  %s\n" % '  '.join(saved_names)
-
         load_name = None
-        while load_name not in saved_names:
+        text = None
+        while load_name not in index['saves']:
+            # Show saved games, most recent first
+            saves = list_saves(index, 'saved', text)
+            print "Saved games found:\n"
+            for entry in saves:
+                print "  %s" % describe_save(entry)
+            print
+
             try:
-                # Prompt for load name
-                load_name = raw_input("Enter the name of the save you want to load: ").lower()
+                # Prompt for load name, else filter saves by it
+                load_name = raw_input("Enter the name of the save you want to load, or text to search for: ").lower()
                 if load_name == '':  # Cancel
                     return
             except EOFError:
                 print
+            text = load_name
 
         # Load game
-        load_name = os.path.join(self.save_dir, load_name + '.sav')
-        codemaker, codebreaker = self.load(load_name)
-        self.play(codemaker=codemaker, codebreaker=codebreaker, load_game=True)
+        if self.load(save_path(self.save_dir, load_name)):
+            self.play(load_game=True)
 
     
-    def save(self, save_name, codemaker, codebreaker):
-        """Save game."""
-        try:
-            save_file = open(save_name, 'w')
-        except IOError:
-            print "Game cannot be saved. Aborting...\n"
+    def resume_game(self):
+        """Offer to resume the game set left in the journal, if any."""
+        journal_name = os.path.join(self.journal_dir, JOURNAL_NAME)
+        if not os.path.isfile(journal_name):
             return
 
-        try:
-            pickle.dump(self.games, save_file)
-            pickle.dump(self.length, save_file)
-            pickle.dump(self.colours, save_file)
-            pickle.dump(self.turns, save_file)
+        self.__clear()
+        confirm = None
+        while confirm != 'y' and confirm != 'n':  # Confirm resuming
+            try:
+                confirm = raw_input("An unfinished game was found. Would you like to resume it (Y/n)? ")[0].lower()
+            except EOFError:
+                print
+            except IndexError:
+                confirm = 'y'
 
-            pickle.dump(self.guesses, save_file)
-            pickle.dump(self.feedback, save_file)
-            pickle.dump(self.board, save_file)
+        try:
+            state = read_journal(journal_name, self.feedback_keys) if confirm == 'y' else None
+        except (EnvironmentError, ValueError, struct.error, KeyError, IndexError):
+            print "Unfinished game cannot be resumed. Aborting...\n"
+            try:  # Keep the journal aside, so that it is not offered again
+                os.rename(journal_name, journal_name + '.bad')
+            except OSError:
+                pass
+            return
+        if not state:
+            os.remove(journal_name)
+            return
 
-            pickle.dump(self.current_colours, save_file)
-            pickle.dump(self.current_game, save_file)
-            pickle.dump(self.current_turn, save_file)
+        self.restore(state)
+        self.play(load_game=True)
 
-            pickle.dump(codemaker, save_file)
-            pickle.dump(codebreaker, save_file)
 
-        except pickle.PicklingError:
+    def save(self, save_name):
+        """Save game; return whether it was saved."""
+        try:
+            write_save(save_name, self.engine.state())
+        except (IOError, struct.error):
             print "Game cannot be saved. Aborting...\n"
-
+            return False
         else:
             print "Game saved successfully.\n"
-
-        save_file.close()
+            return True
 
 
     def load(self, load_name):
-        """Load game."""
+        """Load game; return whether it was loaded."""
         try:
-            load_file = open(load_name, 'r')
-        except IOError:
+            state = read_save(load_name, self.feedback_keys)
+        except (EnvironmentError, ValueError, struct.error, pickle.UnpicklingError, EOFError):
             print "Game cannot be loaded. Aborting..."
             self.__pause(self.pause)
             return
 
-        try:
-            self.games = pickle.load(load_file)
-            self.length = pickle.load(load_file)
-            self.colours = pickle.load(load_file)
-            self.turns = pickle.load(load_file)
-            
-            self.guesses = pickle.load(load_file)
-            self.feedback = pickle.load(load_file)
-            self.board = pickle.load(load_file)
-
-            self.current_colours = pickle.load(load_file)
-            self.current_game = pickle.load(load_file)
-            self.current_turn = pickle.load(load_file)
-
-            codemaker = pickle.load(load_file)
-            codebreaker = pickle.load(load_file)
-
-        except pickle.UnpicklingError:
-            print "Game cannot be loaded. Aborting..."
-            self.__pause(self.pause)
-            load_file.close()
+        if state.get('legacy'):  # Convert to the current save format
+            try:
+                write_save(load_name, state)
+            except (IOError, struct.error):
+                pass
 
-        else:
-            load_file.close()
-            return codemaker, codebreaker
+        return self.restore(state)
+
+
+    def restore(self, state):
+        """Restore game set state; return True."""
+        self.engine = GameEngine()
+        self.engine.restore(state)
+
+        # Keep options of the restored game set
+        self.games = state['games']
+        self.length = state['length']
+        self.colours = len(state['colours'])
+        self.turns = state['turns']
+
+        # Rebuild board from the log of the current game
+        self.board = Board(self.length, self.width, self.turns)
+        current = str(self.engine.current_game)
+        for turn, (guess, feedback) in enumerate(zip(self.engine.guesses[current], self.engine.feedback[current])):
+            self.board.update(turn, guess, feedback)
+        return True
 
 
     def display_game_header(self, codemaker, codebreaker):
@@ -354,40 +374,48 @@ class MastermindGame(object):
         The header shown in the secret pattern choice screen.
 
         """
-        print "Mastermind : Play : Game (%d/%d)" % (self.current_game + 1, self.games)
+        engine = self.engine
+        print "Mastermind : Play : Game (%d/%d)" % (engine.current_game + 1, engine.games)
         print "-" * self.width
         print "%s will be playing as the codemaker" % codemaker.name
         print "%s will be playing as the codebreaker" % codebreaker.name
         print
-        print "Using %d pegs" % self.length
-        print "Using %d colours:" % len(self.current_colours),
-        for colour in self.current_colours:
+        print "Using %d pegs" % engine.length
+        print "Using %d colours:" % len(engine.colours),
+        for colour in engine.colours:
             print self.colour_names[colour],
         print
         print "-" * self.width
         print
 
 
-    def display_turn_header(self, codemaker, codebreaker, last_turn=False):
-        """Display turn header.
+    def turn_header(self, codemaker, codebreaker, last_turn=False):
+        """Return rows of turn header.
 
         The header shown on each turn.
 
         """
+        engine = self.engine
         if last_turn:  # Hide turn number on last turn
-            print "Mastermind : Play : Game (%d/%d)" % (self.current_game + 1, self.games)
+            title = "Mastermind : Play : Game (%d/%d)" % (engine.current_game + 1, engine.games)
         else:
-            print "Mastermind : Play : Game (%d/%d) : Turn (%d/%d)" % (self.current_game + 1, self.games, self.current_turn + 1, self.turns)
-        print "-" * self.width
-        print "(Codemaker) %-15s : %-7d" % (codemaker.name, codemaker.score),
-        print "(Codebreaker) %-15s : %-7d" % (codebreaker.name, codebreaker.score)
-        print "Pegs : %-30d" % self.length,
-        print "Colours: %-30s" % ''.join(self.current_colours)
-        print
-        print "Attention, humans: Press Ctrl-D during your turn to save."
-        print "                   Press Ctrl-C anytime to quit."
-        print "-" * self.width
-        print 
+            title = "Mastermind : Play : Game (%d/%d) : Turn (%d/%d)" % (engine.current_game + 1, engine.games, engine.current_turn + 1, engine.turns)
+        return [
+                title,
+                "-" * self.width,
+                "(Codemaker) %-15s : %-7d (Codebreaker) %-15s : %-7d" % (codemaker.name, codemaker.score, codebreaker.name, codebreaker.score),
+                "Pegs : %-30d Colours: %-30s" % (engine.length, ''.join(engine.colours)),
+                "",
+                "Attention, humans: Press Ctrl-D during your turn to save.",
+                "                   Press Ctrl-C anytime to quit.",
+                "-" * self.width,
+                ""
+                ]
+
+
+    def display_turn(self, codemaker, codebreaker, last_turn=False):
+        """Display turn header and board, redrawing only what changed."""
+        self.renderer.render(self.turn_header(codemaker, codebreaker, last_turn) + self.board.rows())
 
 
     def name_players(self, player1, player2):
@@ -404,17 +432,6 @@ class MastermindGame(object):
             player2.ask_for_name("Change your name, Player 2: ")
 
 
-    def decide_roles(self, player1, player2):
-        """Decide roles randomly."""
-        players = [player1, player2]
-        random.shuffle(players)
-
-        codemaker = players.pop()
-        codebreaker = players.pop()
-
-        return codemaker, codebreaker
-
-
     def allocate_colours(self):
         """Return colours for current game set.
 
@@ -424,126 +441,85 @@ class MastermindGame(object):
         return self.colour_codes[:self.colours]
 
     
-    def record_turn(self, guess, feedback):
-        """Record current guess and feedback."""
-        self.guesses[str(self.current_game)].append(guess)
-        self.feedback[str(self.current_game)].append(feedback)
+    def record_turn(self, turn, guess, feedback):
+        """Record guess and feedback at turn on the board and in the
+        journal."""
+        self.board.update(turn, guess, feedback)
+        if self.journal:
+            self.journal.record_turn(turn, guess, feedback)
 
 
     def give_game_feedback(self, codemaker, codebreaker):
         """Give codebreaker feedback for current game."""
-        if codemaker.is_correct(codebreaker.guess):
+        if self.engine.is_solved():
             print "Correct, %s!\n" % codebreaker.name
         else:
             print "Fail, %s. Fail.\n" % codebreaker.name
 
 
-    def declare_winner(self, player1, player2):
+    def declare_winner(self):
         """Declare winner of current game set, else tie."""
-        if player1.score > player2.score:
-            winner = player1
-        elif player2.score > player1.score:
-            winner = player2
-        else:
-            winner = None
-
+        winner = self.engine.winner()
         if winner:
             print "%s wins! Good job!" % winner.name
         else:
             print "It's a tie! Good job!"
 
     
-    def is_last_turn(self):
-        """Return True if last turn, else False."""
-        return self.current_turn == self.turns - 1
-
-
-    def is_last_game(self):
-        """Return True if last game, else False."""
-        return self.current_game == self.games - 1
-
-    
-    def play(self, player1=None, player2=None, codemaker=None, codebreaker=None, load_game=False):
-        """Main game mechanics and logic loop."""
+    def play(self, player1=None, player2=None, load_game=False):
+        """Main game loop, playing the game set of the engine."""
         if not load_game:  # Initialise new game set
-            self.current_colours = self.allocate_colours()
-            self.current_game = 0
-
             self.__clear()
 
             self.name_players(player1, player2)
-            codemaker, codebreaker = self.decide_roles(player1, player2)
+            codemaker, codebreaker = decide_roles(player1, player2)
 
-            # Remember current game set rules
-            codemaker.remember_rules(self.length, self.current_colours)
-            codebreaker.remember_rules(self.length, self.current_colours)
+            self.engine = GameEngine(self.games, self.length, self.allocate_colours(), self.turns)
+            self.engine.start(codemaker, codebreaker)
+        engine = self.engine
 
-        for game in range(self.current_game, self.games):
+        if not os.path.isdir(self.journal_dir):  # Make journal directory if none exists
+            os.mkdir(self.journal_dir)
+        self.journal = Journal(os.path.join(self.journal_dir, JOURNAL_NAME))
 
-            if not load_game:  # Initialise new game
-                # Create new record entry
-                self.guesses[str(game)] = []
-                self.feedback[str(game)] = []
-
-                self.current_game = game
-                self.current_turn = 0
-
-                # Initialise board
-                self.board = Board(self.length, self.width, self.turns)
+        while True:
+            codemaker, codebreaker = engine.codemaker, engine.codebreaker
 
-                # Prepare for next game
-                codemaker.ready_for_game()
-                codebreaker.ready_for_game()
+            if engine.phase == SECRET:  # Initialise new game
+                self.board = Board(engine.length, self.width, engine.turns)
 
                 self.__clear()
                 self.display_game_header(codemaker, codebreaker)
 
                 print "%s, DON'T LOOK!" % codebreaker.name.upper()
                 codemaker.choose_secret_pattern("%s, choose a secret pattern: " % codemaker.name)
+                engine.submit_secret(codemaker.secret_pattern)
 
-            for turn in range(self.current_turn, self.turns):
-
-                if load_game:
-                    load_game = False  # Continue normally after loading
+            # Fold finished games into a snapshot of this one
+            self.journal.compact(engine.state())
 
-                self.current_turn = turn
-
-                self.__clear()
-                self.display_turn_header(codemaker, codebreaker)
-                self.board.display()
+            while engine.phase == GUESS:
+                turn = engine.current_turn
+                self.display_turn(codemaker, codebreaker)
 
                 while True:  # Prompt for guess
                     try:
                         codebreaker.make_guess("%s, make a guess: " % codebreaker.name, allow_save=True)
                     except EOFError:  # Ctrl-D is pressed
-                        self.save_game(codemaker, codebreaker)
+                        self.save_game()
+                        self.renderer.invalidate()
                     else:
                         break
 
-                if codemaker.is_correct(codebreaker.guess):  # Correct guess
-                    codemaker.prepare_feedback(codebreaker.guess, self.feedback_keys)
-                    self.record_turn(codebreaker.guess, codemaker.feedback)
-                    self.board.update(turn, codebreaker.guess, codemaker.feedback)
-                    break
+                feedback = engine.submit_guess(codebreaker.guess)
+                self.record_turn(turn, codebreaker.guess, feedback)
 
-                else:
-                    codemaker.prepare_feedback(codebreaker.guess, self.feedback_keys)
+                if not engine.is_solved():
                     print "%s's feedback is" % codemaker.name,
                     codemaker.show_feedback(self.feedback_names)
-                    codebreaker.analyse_feedback(codemaker.feedback)
-
-                    codemaker.gain_point()
-                    if self.is_last_turn():
-                        codemaker.gain_point()
-
-                    self.record_turn(codebreaker.guess, codemaker.feedback)
-                    self.board.update(turn, codebreaker.guess, codemaker.feedback)
-
                     self.__pause(self.pause)
 
-            self.__clear()
-            self.display_turn_header(codemaker, codebreaker, last_turn=True)
-            self.board.display()
+            self.display_turn(codemaker, codebreaker, last_turn=True)
 
             print "%s's secret pattern is" % codemaker.name,
             codemaker.show_secret_pattern(self.colour_names)
@@ -552,8 +528,10 @@ class MastermindGame(object):
             self.give_game_feedback(codemaker, codebreaker)
             self.__pause(self.pause)
 
-            if self.is_last_game():
-                self.declare_winner(codemaker, codebreaker)
+            if engine.is_last_game():
+                self.declare_winner()
                 self.__pause(self.pause)
-            else:
-                codemaker, codebreaker = codebreaker, codemaker  # Swap roles
+                break
+            engine.next_game()  # Swap roles
+
+        self.journal.remove()  # Game set is over, nothing to resume
@@ -1,20 +1,39 @@
-"""Code of the graphical user interface used in the Mastermind project."""
+"""Code of the graphical user interface used in the Mastermind project.
 
+Computer turns run in a background thread and post their result back to
+the GTK main loop with gobject.idle_add, so that the window stays
+responsive, and can stop the game, while the solver works.
+
+"""
+
+import gobject
 import gtk
 import pygtk
-import random
+import threading
+import traceback
 
 from player import Player
 from computer_player import ComputerPlayer
+from game_engine import GUESS, OVER, SECRET, GameEngine, computer_turn, decide_roles
 
 pygtk.require('2.0')
+gobject.threads_init()  # Let Python threads run while GTK waits for events
 
 IMG_DIR = 'img/'
+FEEDBACK_IMAGES = {'b': 'k', 'w': 'w'}  # Feedback keys to peg images
+
+def load_colour_images(images, colours):
+    """Add pixbufs of given colours and of the feedback keys missing from
+    images, shared by all peg buttons."""
+    for colour in list(colours) + FEEDBACK_IMAGES.values():
+        if colour not in images:
+            images[colour] = gtk.gdk.pixbuf_new_from_file(IMG_DIR + colour + '.png')
+
 
 class PegButton(gtk.Button):
-    def __init__(self, current_colours):
+    def __init__(self, colour_images):
         super(PegButton, self).__init__()
-        self.current_colours = current_colours
+        self.colour_images = colour_images
 
         self.set_size_request(48, 48)
 
@@ -25,12 +44,15 @@ class PegButton(gtk.Button):
 
 
     def __change_colour(self):
-        colour_image = IMG_DIR + self.colour + '.png'
-        self.colour_image.clear()
-        self.colour_image.set_from_file(colour_image)
+        if self.colour:
+            self.colour_image.set_from_pixbuf(self.colour_images[self.colour])
+        else:
+            self.colour_image.clear()
 
 
     def set_colour(self, colour):
+        if colour == self.colour:
+            return
         self.colour = colour
         self.__change_colour()
 
@@ -41,9 +63,12 @@ class MastermindGUI(object):
         self.save_dir = "saves/"
 
         self.colour_codes = ['r', 'g', 'b', 'c', 'm', 'y', 'o', 'p']
-        self.feedback_keys = {'correct': 'k', 'partially_correct': 'w'}
 
         self.current_colours = []
+        self.colour_images = {}  # Pixbufs of colour codes and feedback keys
+        self.engine = None  # Game set in play
+        self.generation = 0  # Bumped when a game set starts or stops, to drop stale results
+        self.turn_pause = 500  # Milliseconds between computer turns
 
         self.games = 2
         self.length = 4
@@ -52,6 +77,7 @@ class MastermindGUI(object):
 
         self.guesses = {}
         self.feedback = {}
+        self.board_size = None  # Turns and length of the pegs on the board
 
         self.window = gtk.Window(gtk.WINDOW_TOPLEVEL)
         self.window.set_title("Mastermind")
@@ -59,9 +85,19 @@ class MastermindGUI(object):
 
         self.board = self.__create_board()
 
+        self.status_text = gtk.Label("")
+        self.stop_button = gtk.Button("Stop")
+        self.stop_button.connect('clicked', self.stop)
+        self.stop_button.set_sensitive(False)
+
+        self.status = gtk.HBox(spacing=16)
+        self.status.pack_start(self.status_text)
+        self.status.pack_end(self.stop_button, expand=False)
+
         self.vbox = gtk.VBox()
         self.vbox.pack_start(self.__create_menu())
         self.vbox.pack_start(self.board)
+        self.vbox.pack_end(self.status, expand=False)
 
         self.window.add(self.vbox)
 
@@ -80,16 +116,13 @@ class MastermindGUI(object):
         options_menu_item = gtk.MenuItem("Options")
         exit_menu_item = gtk.MenuItem("Exit")
 
-        single_player_menu_item.connect('activate', self.play, Player(), ComputerPlayer())
-        multiplayer_menu_item.connect('activate', self.play, Player(), Player())
-        duel_menu_item.connect('activate', self.play, ComputerPlayer(), ComputerPlayer())
+        # Players are created anew for every game set
+        single_player_menu_item.connect('activate', self.play, Player, ComputerPlayer)
+        multiplayer_menu_item.connect('activate', self.play, Player, Player)
+        duel_menu_item.connect('activate', self.play, ComputerPlayer, ComputerPlayer)
         options_menu_item.connect('activate', self.options_dialog)
         exit_menu_item.connect('activate', self.quit, self)
 
-        # Unfinished
-        single_player_menu_item.set_sensitive(False)
-        duel_menu_item.set_sensitive(False)
-
         play_menu.append(single_player_menu_item)
         play_menu.append(multiplayer_menu_item)
         play_menu.append(duel_menu_item)
@@ -121,20 +154,24 @@ class MastermindGUI(object):
 
 
     def __create_board(self):
+        self.guesses = {}
+        self.feedback = {}
+        self.board_size = self.turns, self.length
+
         guesses_board = gtk.Table(self.turns, self.length, False)
         feedback_board = gtk.Table(self.turns, self.length, False)
 
         for row in range(self.turns):
             self.guesses[str(row)] = []
             for column in range(self.length):
-                button = PegButton(self.current_colours)
+                button = PegButton(self.colour_images)
                 self.guesses[str(row)].append(button)
                 guesses_board.attach(button, column, column + 1, row, row + 1)
 
         for row in range(self.turns):
             self.feedback[str(row)] = []
             for column in range(self.length):
-                button = PegButton(self.current_colours)
+                button = PegButton(self.colour_images)
                 self.feedback[str(row)].append(button)
                 feedback_board.attach(button, column, column + 1, row, row + 1)
 
@@ -145,9 +182,39 @@ class MastermindGUI(object):
         return board
 
 
-    def __update_board(self, feedback):
-        for i in range(len(feedback)):
-            self.feedback[str(self.current_turn)][i].set_colour(feedback[i])
+    def __reset_board(self):
+        """Clear board for a new game, creating its pegs anew only if the
+        number of turns or the pattern length changed."""
+        if self.board_size != (self.turns, self.length):
+            self.vbox.remove(self.board)
+            self.board.destroy()
+            self.board = self.__create_board()
+            self.board.show_all()
+            self.vbox.pack_start(self.board)
+            return
+
+        pegs = []
+        for row in range(self.turns):
+            pegs.extend((button, '') for button in self.guesses[str(row)] if button.colour)
+            pegs.extend((button, '') for button in self.feedback[str(row)] if button.colour)
+        self.__paint(pegs)
+
+
+    def __update_board(self, turn, guess, feedback):
+        pegs = zip(self.guesses[str(turn)], guess)
+        pegs.extend(zip(self.feedback[str(turn)], [FEEDBACK_IMAGES[key] for key in feedback]))
+        self.__paint(pegs)
+
+
+    def __paint(self, pegs):
+        """Set colours of (button, colour) pairs, redrawing the window once."""
+        window = self.window.window
+        window.freeze_updates()
+        try:
+            for button, colour in pegs:
+                button.set_colour(colour)
+        finally:
+            window.thaw_updates()
 
 
     def file_dialog(self, widget, title, operation_name):
@@ -178,10 +245,8 @@ class MastermindGUI(object):
             self.length = pegs_options_entry_field.get_value_as_int()
             self.colours = colours_options_entry_field.get_value_as_int()
 
-            self.vbox.remove(self.board)
-            self.board = self.__create_board()
-            self.board.show_all()
-            self.vbox.pack_start(self.board)
+            self.stop()  # A game set in play keeps its own rules, so drop it
+            self.__reset_board()
 
             options_dialog.destroy()
 
@@ -256,18 +321,13 @@ class MastermindGUI(object):
     def secret_pattern_dialog(self, codemaker):
 
         def set_secret_pattern(widget):
-            secret_pattern = secret_pattern_field.get_text()[:self.length].lower()
+            secret_pattern = list(secret_pattern_field.get_text()[:self.engine.length].lower())
 
-            if len(secret_pattern) < self.length:
+            if not self.engine.is_valid(secret_pattern):
                 secret_pattern_field.set_text('')
                 return
 
-            for colour in secret_pattern:
-                if colour not in self.current_colours:
-                    secret_pattern_field.set_text('')
-                    return
-
-            codemaker.secret_pattern = secret_pattern
+            self.engine.submit_secret(secret_pattern)
             secret_pattern_dialog.destroy()
 
 
@@ -293,24 +353,16 @@ class MastermindGUI(object):
 
 
     def guess_dialog(self, codebreaker):
+        guesses = []  # Valid guess, if made
 
         def set_guess(widget):
-            guess = guess_field.get_text()[:self.length].lower()
-            
-            if len(guess) < self.length:
+            guess = list(guess_field.get_text()[:self.engine.length].lower())
+
+            if not self.engine.is_valid(guess):
                 guess_field.set_text('')
                 return
 
-            for colour in guess:
-                if colour not in self.current_colours:
-                    guess_field.set_text('')
-                    return
-
-            codebreaker.guess = guess
-
-            for i in range(self.length):
-                self.guesses[str(self.current_turn)][i].set_colour(codebreaker.guess[i])
-
+            guesses.append(guess)
             guess_dialog.destroy()
 
 
@@ -339,6 +391,9 @@ class MastermindGUI(object):
         guess_dialog.show_all()
         guess_dialog.run()
 
+        if guesses:
+            return guesses[0]
+
 
     def show_secret_pattern_dialog(self, secret_pattern):
         secret_pattern = ''.join(secret_pattern)
@@ -359,14 +414,22 @@ class MastermindGUI(object):
         secret_pattern_dialog.run()
 
 
-    def decide_roles(self, player1, player2):
-        players = [player1, player2]
-        random.shuffle(players)
+    def show_error_dialog(self, error):
+        error_dialog = gtk.Dialog("Error", None, \
+                gtk.DIALOG_MODAL | gtk.DIALOG_DESTROY_WITH_PARENT \
+                | gtk.DIALOG_NO_SEPARATOR)
+
+        error_text = gtk.Label("The computer player failed:\n%s" % error.strip().splitlines()[-1])
+        error_text.set_tooltip_text(error)  # Full traceback
+
+        ok_button = gtk.Button("OK")
+        ok_button.connect_object('clicked', gtk.Widget.destroy, error_dialog)
 
-        codemaker = players.pop()
-        codebreaker = players.pop()
+        error_dialog.vbox.pack_start(error_text)
+        error_dialog.action_area.pack_end(ok_button)
 
-        return codemaker, codebreaker
+        error_dialog.show_all()
+        error_dialog.run()
 
 
     def allocate_colours(self):
@@ -374,7 +437,7 @@ class MastermindGUI(object):
 
 
     def give_game_feedback(self, codemaker, codebreaker):
-        if codemaker.is_correct(codebreaker.guess):
+        if self.engine.is_solved():
             text = "Correct, %s!\n" % codebreaker.name
         else:
             text = "Fail, %s. Fail.\n" % codebreaker.name
@@ -395,14 +458,8 @@ class MastermindGUI(object):
         game_feedback_dialog.run()
 
 
-    def declare_winner(self, player1, player2):
-        if player1.score > player2.score:
-            winner = player1
-        elif player2.score > player1.score:
-            winner = player2
-        else:
-            winner = None
-
+    def declare_winner(self):
+        winner = self.engine.winner()
         if winner:
             text = "%s wins! Good job!" % winner.name
         else:
@@ -423,65 +480,127 @@ class MastermindGUI(object):
         winner_dialog.run()
 
 
-    def is_last_turn(self):
-        return self.current_turn == self.turns - 1
+    def play(self, widget, player1_class, player2_class):
+        self.stop()
 
+        player1 = player1_class()
+        player2 = player2_class()
+        for number, player in enumerate((player1, player2)):
+            if isinstance(player, ComputerPlayer):
+                player.quiet = True
+                player.ask_for_name()
+            else:
+                self.name_entry_dialog(player, str(number + 1))
 
-    def is_last_game(self):
-        return self.current_game == self.games - 1
-
+        codemaker, codebreaker = decide_roles(player1, player2)
 
-    def play(self, widget, player1, player2):
         self.current_colours = self.allocate_colours()
-        self.current_game = 0
+        load_colour_images(self.colour_images, self.current_colours)
+        self.engine = GameEngine(self.games, self.length, self.current_colours, self.turns)
+        self.engine.start(codemaker, codebreaker)
+        self.advance()
 
-        self.name_entry_dialog(player1, "1")
-        self.name_entry_dialog(player2, "2")
 
-        codemaker, codebreaker = self.decide_roles(player1, player2)
+    def advance(self):
+        """Play the game set on until it waits for a computer turn."""
+        engine = self.engine
+        while engine is self.engine and engine is not None:
+            codemaker, codebreaker = engine.codemaker, engine.codebreaker
 
-        codemaker.remember_rules(self.length, self.current_colours)
-        codebreaker.remember_rules(self.length, self.current_colours)
+            if engine.phase == SECRET:
+                self.__reset_board()
 
-        for game in range(self.current_game, self.games):
-            self.current_game = game
-            self.current_turn = 0
+                if isinstance(codemaker, ComputerPlayer):
+                    codemaker.choose_secret_pattern()
+                    engine.submit_secret(codemaker.secret_pattern)
+                else:
+                    self.secret_pattern_dialog(codemaker)
+                    if engine.phase == SECRET:  # Dialog closed
+                        self.stop()
+
+            elif engine.phase == GUESS and isinstance(codebreaker, ComputerPlayer):
+                self.status_text.set_text("%s is thinking..." % codebreaker.name)
+                self.stop_button.set_sensitive(True)
+                self.run_in_background(computer_turn, self.computer_turn_done)
+                return
 
-            self.vbox.remove(self.board)
-            self.board = self.__create_board()
-            self.board.show_all()
-            self.vbox.pack_end(self.board)
+            elif engine.phase == GUESS:
+                self.status_text.set_text("%s, make a guess" % codebreaker.name)
+                turn = engine.current_turn
+                guess = self.guess_dialog(codebreaker)
+                if guess is None:  # Dialog closed
+                    self.stop()
+                else:
+                    self.__update_board(turn, guess, engine.submit_guess(guess))
 
-            self.secret_pattern_dialog(codemaker)
+            elif engine.phase == OVER:
+                self.status_text.set_text("")
+                self.show_secret_pattern_dialog(codemaker.secret_pattern)
+                self.give_game_feedback(codemaker, codebreaker)
 
-            for turn in range(self.current_turn, self.turns):
-                self.current_turn = turn
+                if engine.is_last_game():
+                    self.declare_winner()
+                    self.stop()
+                else:
+                    engine.next_game()
 
-                self.guess_dialog(codebreaker)
 
-                if codemaker.is_correct(codebreaker.guess):
-                    codemaker.prepare_feedback(codebreaker.guess, self.feedback_keys)
-                    self.__update_board(codemaker.feedback)
-                    print "Breaking"
-                    break
+    def run_in_background(self, function, callback):
+        """Run function on the engine in a background thread, then callback
+        in the main loop with its result and error, unless the game set
+        has changed meanwhile."""
+        engine = self.engine
+        generation = self.generation
 
-                else:
-                    codemaker.prepare_feedback(codebreaker.guess, self.feedback_keys)
-                    codebreaker.analyse_feedback(codemaker.feedback)
+        def deliver(result, error):
+            if generation == self.generation:
+                callback(result, error)
+            return False  # Run once
 
-                    codemaker.gain_point()
-                    if self.is_last_turn():
-                        codemaker.gain_point()
 
-                    self.__update_board(codemaker.feedback)
+        def work():
+            try:
+                result = function(engine)
+            except Exception:
+                gobject.idle_add(deliver, None, traceback.format_exc())
+            else:
+                gobject.idle_add(deliver, result, None)
 
-            self.show_secret_pattern_dialog(codemaker.secret_pattern)
-            self.give_game_feedback(codemaker, codebreaker)
 
-            if self.is_last_game():
-                self.declare_winner(codemaker, codebreaker)
-            else:
-                codemaker, codebreaker = codebreaker, codemaker
+        worker = threading.Thread(target=work)
+        worker.daemon = True  # Do not keep a closed window waiting for the solver
+        worker.start()
+
+
+    def computer_turn_done(self, result, error):
+        """Show computer turn, and play on after a pause."""
+        self.stop_button.set_sensitive(False)
+        if error:
+            self.status_text.set_text("The computer player failed")
+            self.stop()
+            self.show_error_dialog(error)
+            return
+
+        turn, guess, feedback = result
+        self.__update_board(turn, guess, feedback)
+        self.status_text.set_text("")
+
+        generation = self.generation
+
+        def resume():
+            if generation == self.generation:
+                self.advance()
+            return False  # Run once
+
+
+        gobject.timeout_add(self.turn_pause, resume)
+
+
+    def stop(self, widget=None):
+        """Stop game set in play, dropping any computer turn in progress."""
+        self.generation += 1
+        self.engine = None
+        self.stop_button.set_sensitive(False)
 
 
     def quit(self, widget, data):
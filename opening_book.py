@@ -0,0 +1,163 @@
+"""Opening book used by the ComputerPlayer class of the Mastermind project.
+
+A book holds, for every (pattern length, number of colours) game set, the
+decision tree of a guess strategy over its first turns, so that the opening
+guesses are looked up instead of searched for in every game.
+
+Books are built offline, one file per strategy:
+    $ ./mastermind.py -b [strategy] [depth]
+
+Only game sets small enough to be kept whole from the first turn (see
+guess_strategies.FULL_SEARCH_LIMIT) get a tree; larger ones are searched on
+random samples of their codes, which a book cannot stand for.
+
+File format (big-endian):
+    header   'MMBK', version (B), strategy name length (B), strategy name,
+             number of sections (B)
+    section  pattern length (B), number of colours (B), number of nodes (I),
+             nodes in pre-order
+    node     guess index (I), number of children (B),
+             then per child its feedback key (B) followed by the child node
+
+"""
+
+import os
+import struct
+
+from code_space import get_code_space
+from guess_strategies import FULL_SEARCH_LIMIT, STRATEGIES, choose_guess
+
+BOOK_DIR = 'books'
+BOOK_MAGIC = 'MMBK'
+BOOK_VERSION = 1
+
+books = {}
+
+def book_name(strategy):
+    """Return file name of the book of given strategy."""
+    return os.path.join(BOOK_DIR, strategy + '.book')
+
+
+def build_tree(code_space, strategy, depth):
+    """Return decision tree of strategy over the first depth turns.
+
+    Nodes are [guess, {feedback key: child node}]; guesses left to the
+    strategy (two candidates or fewer) are not stored.
+
+    """
+    correct = code_space.feedback_key(code_space.pattern_length, 0)
+
+    def explore(candidates, history):
+        """Return node for candidates left by history, else None."""
+        if len(history) >= depth or len(candidates) <= 2:
+            return None
+
+        guess = choose_guess(code_space, candidates, strategy, history)
+        node = [guess, {}]
+
+        partitions = code_space.partition(candidates, guess)
+        for key in sorted(partitions):
+            if key == correct:
+                continue
+            child = explore(partitions[key], history + [(guess, key)])
+            if child is not None:
+                node[1][key] = child
+        return node
+
+    return explore(code_space.all_codes(), [])
+
+
+def pack_tree(node):
+    """Return node and its children packed in pre-order, and their number."""
+    if node is None:
+        return '', 0
+
+    guess, children = node
+    packed = [struct.pack('>IB', guess, len(children))]
+    nodes = 1
+    for key in sorted(children):
+        child, child_nodes = pack_tree(children[key])
+        packed.append(struct.pack('>B', key) + child)
+        nodes += child_nodes
+    return ''.join(packed), nodes
+
+
+def unpack_tree(data, offset, history, entries):
+    """Add node packed at offset and its children to entries, keyed by
+    history; return offset past them."""
+    guess, children = struct.unpack_from('>IB', data, offset)
+    offset += 5
+    entries[tuple(history)] = guess
+    for child in range(children):
+        key = struct.unpack_from('>B', data, offset)[0]
+        offset = unpack_tree(data, offset + 1, history + [(guess, key)], entries)
+    return offset
+
+
+def build_book(strategy, depth=3, colour_codes='rgbcmyop', sizes=range(3, 9)):
+    """Build and save book of strategy for every game set."""
+    if strategy not in STRATEGIES:
+        raise ValueError("Unknown strategy: %s" % strategy)
+
+    sections = []
+    for length in sizes:
+        for colours in sizes:
+            code_space = get_code_space(length, colour_codes[:colours])
+            tree = None
+            if code_space.size <= FULL_SEARCH_LIMIT:
+                tree = build_tree(code_space, strategy, depth)
+            packed, nodes = pack_tree(tree)
+            sections.append(struct.pack('>BBI', length, colours, nodes) + packed)
+            print "%dx%d: %d nodes" % (length, colours, nodes)
+
+    if not os.path.isdir(BOOK_DIR):  # Make book directory if none exists
+        os.mkdir(BOOK_DIR)
+
+    book_file = open(book_name(strategy), 'wb')
+    book_file.write(struct.pack('>4sBB', BOOK_MAGIC, BOOK_VERSION, len(strategy)))
+    book_file.write(strategy)
+    book_file.write(struct.pack('>B', len(sections)))
+    book_file.write(''.join(sections))
+    book_file.close()
+
+
+def load_book(strategy):
+    """Return book of strategy as {(length, colours): {history: guess}}.
+
+    The book is read once per process; a missing or unreadable book is empty.
+
+    """
+    if strategy in books:
+        return books[strategy]
+
+    book = {}
+    try:
+        book_file = open(book_name(strategy), 'rb')
+        data = book_file.read()
+        book_file.close()
+
+        magic, version, name_length = struct.unpack_from('>4sBB', data, 0)
+        offset = 6 + name_length
+        if magic != BOOK_MAGIC or version != BOOK_VERSION or data[6:offset] != strategy:
+            raise ValueError("Invalid book: %s" % book_name(strategy))
+
+        sections = struct.unpack_from('>B', data, offset)[0]
+        offset += 1
+        for section in range(sections):
+            length, colours, nodes = struct.unpack_from('>BBI', data, offset)
+            offset += 6
+            entries = {}
+            if nodes:
+                offset = unpack_tree(data, offset, [], entries)
+            book[(length, colours)] = entries
+
+    except (IOError, ValueError, struct.error):
+        book = {}
+
+    books[strategy] = book
+    return book
+
+
+def get_opening(strategy, pattern_length, pattern_colours):
+    """Return {history: guess} opening of strategy for given rules."""
+    return load_book(strategy).get((pattern_length, len(pattern_colours)), {})
@@ -0,0 +1,74 @@
+"""Pacing of the Mastermind project.
+
+Every pause of the text game and every keystroke a ComputerPlayer types go
+through a clock, so that interactive play keeps its feel while unattended
+duels and test runs finish at CPU speed:
+    real      sleep as long as asked
+    scaled    sleep a fraction (or multiple) of it
+    instant   never sleep
+
+Players and games take a clock when created, else use the default clock,
+which the command line selects:
+    $ ./mastermind.py -t [real|scaled [factor]|instant]
+
+"""
+
+import time
+
+class RealClock(object):
+
+    """Clock sleeping as long as asked."""
+
+    def sleep(self, seconds):
+        """Sleep given seconds."""
+        time.sleep(seconds)
+
+
+class ScaledClock(object):
+
+    """Clock sleeping a given factor of what is asked."""
+
+    def __init__(self, factor):
+        self.factor = factor
+
+
+    def sleep(self, seconds):
+        """Sleep factor times given seconds."""
+        if seconds * self.factor > 0:
+            time.sleep(seconds * self.factor)
+
+
+class InstantClock(object):
+
+    """Clock never sleeping."""
+
+    def sleep(self, seconds):
+        """Return immediately."""
+        pass
+
+
+PACINGS = ['real', 'scaled', 'instant']
+SCALE = 0.25  # Default factor of the scaled pacing
+
+default_clock = RealClock()
+
+def make_clock(pacing, factor=SCALE):
+    """Return clock of given pacing."""
+    if pacing == 'real':
+        return RealClock()
+    elif pacing == 'scaled':
+        return ScaledClock(factor)
+    elif pacing == 'instant':
+        return InstantClock()
+    raise ValueError("Unknown pacing: %s" % pacing)
+
+
+def set_pacing(pacing, factor=SCALE):
+    """Set default clock to given pacing."""
+    global default_clock
+    default_clock = make_clock(pacing, factor)
+
+
+def get_clock(clock=None):
+    """Return clock if given, else the default clock."""
+    return clock or default_clock
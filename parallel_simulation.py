@@ -0,0 +1,183 @@
+"""Process pool simulation of the Mastermind project.
+
+Shards simulated games, or the whole secret space, across worker processes:
+    $ ./mastermind.py -p [workers] [games] [length] [colours] [seed] [solver]
+    $ ./mastermind.py -x [workers] [length] [colours] [solver]
+
+Every worker keeps its players, and so the solver caches, warm across the
+shards it runs. Statistics of every shard are merged as soon as it is done.
+A shard whose worker crashes or raises is run again, up to a number of
+retries.
+
+"""
+
+import multiprocessing
+import multiprocessing.queues
+import os
+import Queue
+import random
+import signal
+import time
+import traceback
+
+from code_space import get_code_space
+from simulation import COLOUR_CODES, TURNS, add_cache_lookups, add_result, cache_lookups, \
+        create_players, merge_stats, new_stats, play_game, solve_secret
+
+SHARD_SIZE = 1000  # Games or secrets per shard
+RETRIES = 2        # Times a failed shard is run again
+
+worker_players = {}
+started_shards = None
+
+def init_worker(started):
+    """Initialise worker process."""
+    global started_shards
+    started_shards = started
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Leave Ctrl-C to the parent
+
+
+def warm_players(length, colours, strategy, indexed):
+    """Return players of this worker for given rules, creating them once."""
+    key = (length, colours, strategy, indexed)
+    if key not in worker_players:
+        worker_players[key] = create_players(length, colours, strategy, indexed)
+    return worker_players[key]
+
+
+def run_games(games, length, colours, seed, strategy, turns, indexed):
+    """Return statistics of games between computer players."""
+    random.seed(seed)
+    codemaker, codebreaker = warm_players(length, colours, strategy, indexed)
+
+    stats = new_stats()
+    for game in range(games):
+        add_result(stats, play_game(codemaker, codebreaker, turns))
+    return stats
+
+
+def run_secrets(start, stop, length, colours, strategy, turns, indexed):
+    """Return statistics of solving every secret index in [start, stop)."""
+    codemaker, codebreaker = warm_players(length, colours, strategy, indexed)
+    code_space = get_code_space(length, COLOUR_CODES[:colours])
+
+    stats = new_stats()
+    for index in range(start, stop):
+        add_result(stats, solve_secret(codebreaker, code_space.decode(index), turns))
+    return stats
+
+
+shard_runners = {'games': run_games, 'secrets': run_secrets}
+
+def run_shard(task):
+    """Run shard task in a worker; return (shard, stats, error)."""
+    shard, kind, args = task
+    started_shards.put((shard, os.getpid()))
+
+    lookups = cache_lookups()
+    start = time.time()
+    try:
+        stats = shard_runners[kind](*args)
+    except Exception:
+        return shard, None, traceback.format_exc()
+    stats['seconds'] = time.time() - start
+    add_cache_lookups(stats, lookups)
+    return shard, stats, None
+
+
+def run_shards(tasks, workers=None, retries=RETRIES, progress=None):
+    """Run shard tasks on a pool of workers; return merged statistics.
+
+    progress, if given, is called with (shard, stats, total) as every shard
+    is merged. Shards still failing after retries are listed in
+    total['failed'].
+
+    """
+    started = multiprocessing.queues.SimpleQueue()  # Unbuffered, survives a crash right after put
+    pool = multiprocessing.Pool(workers, init_worker, (started,))
+    results = Queue.Queue()
+
+    pending = dict((task[0], task) for task in tasks)
+    attempts = dict((shard, 0) for shard in pending)
+    running = {}  # Worker pid of every started shard
+
+    total = new_stats()
+    total['failed'] = []
+
+    def submit(shard):
+        """Submit shard to the pool."""
+        running.pop(shard, None)
+        pool.apply_async(run_shard, (pending[shard],), callback=results.put)
+
+
+    def retry(shard, error):
+        """Submit shard again, else give up on it."""
+        attempts[shard] += 1
+        if attempts[shard] > retries:
+            del pending[shard]
+            total['failed'].append((shard, error))
+        else:
+            submit(shard)
+
+
+    start = time.time()
+    for shard in sorted(pending):
+        submit(shard)
+
+    try:
+        while pending:
+            while not started.empty():
+                shard, pid = started.get()
+                running[shard] = pid
+
+            try:
+                shard, stats, error = results.get(timeout=0.5)
+            except Queue.Empty:
+                # Resubmit shards whose worker, by the pid it reported, has died
+                alive = set(process.pid for process in multiprocessing.active_children())
+                for shard, pid in running.items():
+                    if shard in pending and pid not in alive:
+                        retry(shard, "Worker %d died" % pid)
+                continue
+
+            if shard not in pending:  # Finished by an earlier attempt
+                continue
+            if stats is None:
+                retry(shard, error)
+                continue
+
+            del pending[shard]
+            merge_stats(total, stats)
+            if progress:
+                progress(shard, stats, total)
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+    total['cpu_seconds'] = total['seconds']
+    total['seconds'] = time.time() - start  # Wall time
+    return total
+
+
+def simulate_parallel(games, length=4, colours=6, seed=None, strategy=None,
+        workers=None, turns=TURNS, shard_size=SHARD_SIZE, indexed=True):
+    """Play games between computer players on a pool of workers."""
+    tasks = []
+    for shard, first in enumerate(range(0, games, shard_size)):
+        shard_seed = None if seed is None else seed * 1000003 + shard
+        shard_games = min(shard_size, games - first)
+        tasks.append((shard, 'games', (shard_games, length, colours, shard_seed, strategy, turns,
+                indexed)))
+    return run_shards(tasks, workers)
+
+
+def solve_all_parallel(length=4, colours=6, strategy=None, workers=None,
+        turns=TURNS, shard_size=SHARD_SIZE, indexed=True):
+    """Solve every secret of given rules on a pool of workers."""
+    size = colours ** length
+    tasks = []
+    for shard, first in enumerate(range(0, size, shard_size)):
+        tasks.append((shard, 'secrets', (first, min(first + shard_size, size), length, colours, strategy,
+                turns, indexed)))
+    return run_shards(tasks, workers)
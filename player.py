@@ -1,16 +1,79 @@
 """Definition of the Player class used in the Mastermind project."""
 
-from functions import remove_empty_elements
+from itertools import izip
+
+from code_space import get_code_space
+from instrumentation import timed
 
 class Player(object):
 
-    """Mastermind Player class."""
+    """Mastermind Player class.
+
+    Players keep their state in slots, and share the rules of a game set
+    through its CodeSpace, so that many can be kept in memory at once.
+
+    Feedback is computed from a code of the secret pattern, its colour
+    digit at every position and its count of every colour, made once per
+    secret pattern.
+
+    """
+
+    __slots__ = ('name', 'score', 'code_space', 'secret', 'secret_code', 'unmatched', 'guess',
+            'feedback')
 
     def __init__(self):
         self.name = ''
         self.score = 0
 
 
+    def __getstate__(self):
+        """Return state for pickling."""
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+
+    def __setstate__(self, state):
+        """Restore pickled state, including players pickled by earlier
+        versions."""
+        state = dict(state)
+        if 'pattern_length' in state:  # Earlier versions kept the rules per player
+            self.remember_rules(state.pop('pattern_length'), state.pop('pattern_colours'))
+        for name, value in state.items():
+            try:
+                setattr(self, name, value)
+            except AttributeError:  # Dropped since
+                pass
+
+
+    @property
+    def secret_pattern(self):
+        """Return secret pattern."""
+        return self.secret
+
+
+    @secret_pattern.setter
+    def secret_pattern(self, pattern):
+        """Set secret pattern, to be coded when feedback is first needed."""
+        self.secret = pattern
+        self.secret_code = None
+
+
+    @property
+    def pattern_length(self):
+        """Return number of pegs of the current game set."""
+        return self.code_space.pattern_length
+
+
+    @property
+    def pattern_colours(self):
+        """Return colours of the current game set."""
+        return self.code_space.pattern_colours
+
+
     def __validate_input(self, message, allow_save=False):
         """Validate pattern input; return pattern on success, else None."""
         pattern = None
@@ -35,8 +98,7 @@ class Player(object):
 
     def remember_rules(self, pattern_length, pattern_colours):
         """Remember current game set rules."""
-        self.pattern_length = pattern_length
-        self.pattern_colours = pattern_colours
+        self.code_space = get_code_space(pattern_length, pattern_colours)
 
     
     def ready_for_game(self):
@@ -55,9 +117,10 @@ class Player(object):
 
     def choose_secret_pattern(self, message=''):
         """Set secret pattern."""
-        self.secret_pattern = None
-        while not self.secret_pattern:
-            self.secret_pattern = self.__validate_input(message)
+        secret_pattern = None
+        while not secret_pattern:
+            secret_pattern = self.__validate_input(message)
+        self.secret_pattern = secret_pattern
 
 
     def make_guess(self, message='', allow_save=False):
@@ -72,28 +135,34 @@ class Player(object):
         return guess == self.secret_pattern
 
 
+    @timed('prepare_feedback')
     def prepare_feedback(self, guess, feedback_keys):
-        """Prepare feedback for guess."""
-        self.feedback = []
-
-        guess = list(guess)                         # Cast from str
-        secret_pattern = list(self.secret_pattern)  # Make a copy
-
-        # Find correct pegs (feedback 'black')
-        for i, colour in enumerate(guess):
-            if colour == secret_pattern[i]:
-                self.feedback.append(feedback_keys['correct'])
-                guess[i] = secret_pattern[i] = None  # Done
-
-        # Remove done pegs
-        remove_empty_elements(guess)
-        remove_empty_elements(secret_pattern)
-
-        # Find partially correct pegs (feedback 'white')
-        for i, colour in enumerate(guess):
-            if colour in secret_pattern:
-                self.feedback.append(feedback_keys['partially_correct'])
-                secret_pattern[secret_pattern.index(colour)] = None  # Done
+        """Prepare feedback for guess.
+
+        Correct pegs (feedback 'black') are found position by position;
+        partially correct pegs (feedback 'white') are the colours guess and
+        secret pattern have in common, less the correct pegs. Pegs of guess
+        are matched against the colours of the secret pattern left
+        unmatched, counted in an array reused by every call.
+
+        """
+        if self.secret_code is None:
+            self.secret_code = self.code_space.colour_code(self.secret)
+            self.unmatched = list(self.secret_code[1])
+        secret_digits, secret_counts = self.secret_code
+        colour_digits = self.code_space.colour_digits
+        unmatched = self.unmatched
+        unmatched[:] = secret_counts  # In place
+
+        blacks = matches = 0
+        for colour, secret_digit in izip(guess, secret_digits):
+            digit = colour_digits[colour]
+            blacks += digit == secret_digit
+            if unmatched[digit]:
+                unmatched[digit] -= 1
+                matches += 1
+        self.feedback = [feedback_keys['correct']] * blacks + \
+                [feedback_keys['partially_correct']] * (matches - blacks)
 
 
     def show_feedback(self, feedback_names):
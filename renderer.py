@@ -0,0 +1,110 @@
+"""Terminal renderer of the Mastermind project.
+
+Draws the play screen (turn header and board) without clearing the whole
+terminal every turn. The renderer remembers the rows it has drawn, and on
+the next frame moves the cursor with ANSI escape sequences to rewrite only
+the rows that changed, then erases whatever was printed below the frame.
+Every frame is one buffered write.
+
+Full redraws are used when the screen is unknown (after other output), and
+when the frame and prompts would not fit the terminal, as scrolling would
+move the rows. Output that is not a terminal, such as a pipe or a log,
+always gets full frames as plain text, and no escape sequences.
+
+"""
+
+import fcntl
+import struct
+import sys
+import termios
+
+from instrumentation import ENABLED, count, timed
+
+CLEAR = '\x1b[H\x1b[2J'  # Cursor home, erase screen
+CLEAR_LINE = '\x1b[K'    # Erase to end of row
+CLEAR_BELOW = '\x1b[J'   # Erase to end of screen
+MOVE = '\x1b[%d;1H'      # Cursor to start of row (1-based)
+
+PROMPT_ROWS = 6  # Rows kept free below a frame for prompts and feedback
+
+def terminal_rows(stream):
+    """Return number of rows of the terminal of stream, else None."""
+    try:
+        rows = struct.unpack('hh', fcntl.ioctl(stream.fileno(), termios.TIOCGWINSZ, '\0' * 4))[0]
+    except (IOError, AttributeError, ValueError):
+        return
+    return rows or None
+
+
+class TerminalRenderer(object):
+
+    """Differential renderer of full-screen frames."""
+
+    def __init__(self, stream=None):
+        self.output = stream  # Else whatever sys.stdout is at the time
+        self.screen = None    # Rows on screen, None if unknown
+
+
+    @property
+    def stream(self):
+        """Return output stream."""
+        return self.output or sys.stdout
+
+
+    @property
+    def tty(self):
+        """Return whether output is a terminal."""
+        return hasattr(self.stream, 'isatty') and self.stream.isatty()
+
+
+    def write(self, text):
+        """Write text to stream at once."""
+        self.stream.write(text)
+        self.stream.flush()
+
+
+    def clear(self):
+        """Clear screen."""
+        if not self.tty:
+            self.write('\n')  # Separate screens
+            return
+        self.write(CLEAR)
+        self.screen = None  # Other output follows
+
+
+    def invalidate(self):
+        """Forget the screen, after output the renderer does not track."""
+        self.screen = None
+
+
+    def fits(self, rows):
+        """Return whether a frame of given rows and prompts below it fit
+        the terminal."""
+        height = terminal_rows(self.stream)
+        return height is None or rows + PROMPT_ROWS <= height
+
+
+    @timed('render frame')
+    def render(self, frame):
+        """Draw frame (list of rows), rewriting only rows that changed."""
+        if not self.tty:
+            self.write('\n'.join(frame) + '\n')
+            return
+
+        if self.screen is None or not self.fits(len(frame)):
+            self.write(CLEAR + '\n'.join(frame) + '\n')
+            self.screen = list(frame)
+            return
+
+        output = []
+        for row, line in enumerate(frame):
+            if row >= len(self.screen) or self.screen[row] != line:
+                output.append(MOVE % (row + 1) + line + CLEAR_LINE)
+        for row in range(len(frame), len(self.screen)):  # Rows of a longer frame
+            output.append(MOVE % (row + 1) + CLEAR_LINE)
+        output.append(MOVE % (len(frame) + 1) + CLEAR_BELOW)  # Erase prompts of the last frame
+        if ENABLED:
+            count('render rows rewritten', len(output) - 1)
+
+        self.write(''.join(output))
+        self.screen = list(frame)
@@ -0,0 +1,302 @@
+"""Binary save format of the Mastermind project.
+
+A save holds the game set state as a dict:
+    games, length, turns, current_game, current_turn   game set progress
+    colours                                             list of colour codes
+    guesses, feedback                                   {str(game): [...]}
+    codemaker, codebreaker                              Player objects
+
+File format (little-endian):
+    header   'MMSV', version (B), games (H), length (B), number of colours
+             (B), turns (B), current game (H), current turn (B), then the
+             colour codes
+    player   twice, codemaker first: computer (B), indexed (B), strategy
+             name length (B), strategy name, name length (H, B in version
+             1 saves), name, score (I), has secret (B), secret code (I)
+    log      number of games (H), then per game its number of turns (B)
+             followed by the guess code (I) and feedback key (B) of each
+
+Codes and feedback are packed as in CodeSpace. Files are read through a
+memory map, so that reading only the header of a save stays cheap. Saves
+of the earlier pickle format are converted on reading.
+
+"""
+
+import mmap
+import pickle
+import struct
+
+from code_space import get_code_space
+from computer_player import ComputerPlayer
+from instrumentation import ENABLED, count, timed
+from player import Player
+
+SAVE_MAGIC = 'MMSV'
+SAVE_VERSION = 2
+
+HEADER = struct.Struct('<4sBHBBBHB')
+PLAYER = struct.Struct('<BBB')
+SCORE = struct.Struct('<IBI')
+TURN = struct.Struct('<IB')
+STRING_LENGTH = {1: struct.Struct('<B'), 2: struct.Struct('<H')}  # By save version
+
+def pack_string(text):
+    """Return text packed with its length."""
+    return STRING_LENGTH[SAVE_VERSION].pack(len(text)) + text
+
+
+def unpack_string(data, offset, version=SAVE_VERSION):
+    """Return string packed at offset in a save of given version, and offset
+    past it."""
+    length = STRING_LENGTH[version].unpack_from(data, offset)[0]
+    offset += STRING_LENGTH[version].size
+    return data[offset:offset + length], offset + length
+
+
+def pack_player(player, code_space):
+    """Return player packed."""
+    computer = isinstance(player, ComputerPlayer)
+    strategy = (getattr(player, 'strategy', None) or '') if computer else ''
+    indexed = computer and getattr(player, 'indexed', False)
+    secret_pattern = getattr(player, 'secret_pattern', None)
+
+    packed = PLAYER.pack(computer, indexed, len(strategy)) + strategy
+    packed += pack_string(player.name)
+    if secret_pattern:
+        packed += SCORE.pack(player.score, 1, code_space.encode(secret_pattern))
+    else:
+        packed += SCORE.pack(player.score, 0, 0)
+    return packed
+
+
+def unpack_player(data, offset, code_space, version=SAVE_VERSION):
+    """Return player packed at offset in a save of given version, and offset
+    past it."""
+    computer, indexed, strategy_length = PLAYER.unpack_from(data, offset)
+    offset += PLAYER.size
+    strategy = data[offset:offset + strategy_length] or None
+    offset += strategy_length
+    name, offset = unpack_string(data, offset, version)
+    score, has_secret, secret = SCORE.unpack_from(data, offset)
+    offset += SCORE.size
+
+    if computer:
+        player = ComputerPlayer(indexed=bool(indexed), strategy=strategy)
+    else:
+        player = Player()
+    player.name = name
+    player.score = score
+    player.remember_rules(code_space.pattern_length, code_space.pattern_colours)
+    if has_secret:
+        player.secret_pattern = code_space.decode(secret)
+    return player, offset
+
+
+def pack_save(state):
+    """Return state packed."""
+    code_space = get_code_space(state['length'], state['colours'])
+
+    packed = [HEADER.pack(SAVE_MAGIC, SAVE_VERSION, state['games'], state['length'],
+        len(state['colours']), state['turns'], state['current_game'], state['current_turn'])]
+    packed.append(''.join(state['colours']))
+    packed.append(pack_player(state['codemaker'], code_space))
+    packed.append(pack_player(state['codebreaker'], code_space))
+
+    packed.append(struct.pack('<H', state['current_game'] + 1))
+    for game in range(state['current_game'] + 1):
+        guesses = state['guesses'].get(str(game), [])
+        feedback = state['feedback'].get(str(game), [])
+        packed.append(struct.pack('<B', len(guesses)))
+        for guess, keys in zip(guesses, feedback):
+            packed.append(TURN.pack(code_space.encode(guess), code_space.key_of(keys)))
+    return ''.join(packed)
+
+
+def unpack_feedback(code_space, key, feedback_keys):
+    """Return feedback of packed feedback key."""
+    blacks, whites = code_space.split_key(key)
+    return [feedback_keys['correct']] * blacks + [feedback_keys['partially_correct']] * whites
+
+
+def unpack_header(data):
+    """Return game set progress, colours and save version of packed state,
+    and offset past them."""
+    magic, version, games, length, colours, turns, current_game, current_turn = \
+            HEADER.unpack_from(data, 0)
+    if magic != SAVE_MAGIC or version not in STRING_LENGTH:
+        raise ValueError("Not a save of version %d or earlier" % SAVE_VERSION)
+
+    offset = HEADER.size
+    state = {
+            'version': version,
+            'games': games,
+            'length': length,
+            'turns': turns,
+            'current_game': current_game,
+            'current_turn': current_turn,
+            'colours': list(data[offset:offset + colours])
+            }
+    return state, offset + colours
+
+
+def unpack_summary(data):
+    """Return game set progress, colours and players' names, scores and
+    types of packed state, without building players or reading the log."""
+    state, offset = unpack_header(data)
+    state['players'] = []
+    for role in ('codemaker', 'codebreaker'):
+        computer, indexed, strategy_length = PLAYER.unpack_from(data, offset)
+        offset += PLAYER.size + strategy_length
+        name, offset = unpack_string(data, offset, state['version'])
+        score = SCORE.unpack_from(data, offset)[0]
+        offset += SCORE.size
+        state['players'].append({'role': role, 'name': name, 'score': score, 'computer': bool(computer)})
+    return state
+
+
+def unpack_save(data, feedback_keys):
+    """Return state packed in data.
+
+    The log of the current game is replayed to computer codebreakers, so
+    that they continue solving where they stopped.
+
+    """
+    state = unpack_state(data, feedback_keys)
+    restore_players(state)
+    return state
+
+
+def unpack_state(data, feedback_keys):
+    """Return state packed in data, with players not yet restored."""
+    state, offset = unpack_header(data)
+    code_space = get_code_space(state['length'], state['colours'])
+
+    state['codemaker'], offset = unpack_player(data, offset, code_space, state['version'])
+    state['codebreaker'], offset = unpack_player(data, offset, code_space, state['version'])
+
+    state['guesses'] = {}
+    state['feedback'] = {}
+    games = struct.unpack_from('<H', data, offset)[0]
+    offset += 2
+    for game in range(games):
+        turns = struct.unpack_from('<B', data, offset)[0]
+        offset += 1
+        guesses = state['guesses'][str(game)] = []
+        feedback = state['feedback'][str(game)] = []
+        for turn in range(turns):
+            guess, key = TURN.unpack_from(data, offset)
+            offset += TURN.size
+            guesses.append(code_space.decode(guess))
+            feedback.append(unpack_feedback(code_space, key, feedback_keys))
+    return state
+
+
+def restore_players(state):
+    """Prepare computer players of state for the current game, replaying
+    its log to a computer codebreaker."""
+    for player in (state['codemaker'], state['codebreaker']):
+        if isinstance(player, ComputerPlayer):
+            player.ready_for_game()
+
+    codebreaker = state['codebreaker']
+    if isinstance(codebreaker, ComputerPlayer):
+        current = str(state['current_game'])
+        for guess, feedback in zip(state['guesses'].get(current, []), state['feedback'].get(current, [])):
+            codebreaker.guess = list(guess)
+            codebreaker.analyse_feedback(feedback)
+
+
+def read_legacy(load_file):
+    """Return state of a save of the earlier pickle format."""
+    state = {}
+    for key in ('games', 'length', 'colour_count', 'turns', 'guesses', 'feedback', 'board',
+            'colours', 'current_game', 'current_turn', 'codemaker', 'codebreaker'):
+        state[key] = pickle.load(load_file)
+    del state['colour_count'], state['board']  # Implied by colours and the log
+
+    # Rebuild players, as pickled ones lack attributes added since
+    for role in ('codemaker', 'codebreaker'):
+        old_player = state[role]
+        if isinstance(old_player, ComputerPlayer):
+            player = ComputerPlayer()
+        else:
+            player = Player()
+        player.name = old_player.name
+        player.score = old_player.score
+        player.remember_rules(state['length'], state['colours'])
+        if getattr(old_player, 'secret_pattern', None):
+            player.secret_pattern = list(old_player.secret_pattern)
+        state[role] = player
+
+    restore_players(state)
+    state['legacy'] = True
+    return state
+
+
+def map_file(load_file):
+    """Return read-only memory map of load_file."""
+    return mmap.mmap(load_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_save(load_name, feedback_keys):
+    """Return state saved in load_name, converting the earlier format."""
+    load_file = open(load_name, 'rb')
+    try:
+        data = map_file(load_file)
+        try:
+            if data[:len(SAVE_MAGIC)] != SAVE_MAGIC:
+                load_file.seek(0)
+                return read_legacy(load_file)
+            return unpack_save(data, feedback_keys)
+        finally:
+            data.close()
+    finally:
+        load_file.close()
+
+
+def read_header(load_name):
+    """Return game set progress saved in load_name without reading players
+    or log."""
+    load_file = open(load_name, 'rb')
+    try:
+        data = map_file(load_file)
+        try:
+            return unpack_header(data)[0]
+        finally:
+            data.close()
+    finally:
+        load_file.close()
+
+
+def read_summary(load_name):
+    """Return game set progress and players saved in load_name without
+    reading the log, converting the earlier format."""
+    load_file = open(load_name, 'rb')
+    try:
+        data = map_file(load_file)
+        try:
+            if data[:len(SAVE_MAGIC)] == SAVE_MAGIC:
+                return unpack_summary(data)
+        finally:
+            data.close()
+
+        load_file.seek(0)
+        state = read_legacy(load_file)
+        state['players'] = [{'role': role, 'name': state[role].name, 'score': state[role].score,
+                'computer': isinstance(state[role], ComputerPlayer)} for role in ('codemaker', 'codebreaker')]
+        return state
+    finally:
+        load_file.close()
+
+
+@timed('write_save')
+def write_save(save_name, state):
+    """Save state to save_name."""
+    data = pack_save(state)
+    if ENABLED:
+        count('write_save bytes', len(data))
+    save_file = open(save_name, 'wb')
+    try:
+        save_file.write(data)
+    finally:
+        save_file.close()
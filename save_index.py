@@ -0,0 +1,205 @@
+"""Save directory index of the Mastermind project.
+
+Keeps a summary of every save in one small JSON file next to the saves, so
+that the load screen can list, sort and filter them without opening each:
+    {'version': 2, 'saves': {name: entry}, 'files': {name: mtime},
+     'directory': [mtime, saves]}
+
+Every entry holds the save name, the time it was saved, its players and
+scores, the game set progress and the game set rules. The index is updated
+on every save, and rebuilt from the save headers when it is missing,
+unreadable or stale: when the save files, by name and modification time,
+differ from those it last saw (a save was added, removed or rewritten
+behind its back). Other files in the directory are ignored.
+
+Reading the index does not stat every save: while the modification time of
+the directory and the number of saves in it match those the index last saw,
+no save was added, removed or renamed, and the index is taken as it is. A
+save rewritten in place behind the back of the index is only found once the
+directory itself changes.
+
+"""
+
+import json
+import os
+import struct
+import time
+
+from save_format import read_summary
+
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 2
+SAVE_EXTENSION = '.sav'
+
+SORT_KEYS = {
+        'name': lambda entry: entry['name'],
+        'saved': lambda entry: -entry['saved'],  # Most recent first
+        'progress': lambda entry: -entry['current_game']
+        }
+
+def index_name(save_dir):
+    """Return path of the index of save_dir."""
+    return os.path.join(save_dir, INDEX_NAME)
+
+
+def save_path(save_dir, name):
+    """Return path of save name in save_dir."""
+    return os.path.join(save_dir, name + SAVE_EXTENSION)
+
+
+def save_names(save_dir):
+    """Return names of the saves in save_dir."""
+    return [file_name[:-len(SAVE_EXTENSION)] for file_name in os.listdir(save_dir)
+            if file_name.endswith(SAVE_EXTENSION)]
+
+
+def save_mtimes(save_dir):
+    """Return modification time of every save in save_dir by name."""
+    mtimes = {}
+    for name in save_names(save_dir):
+        try:
+            mtimes[name] = os.path.getmtime(save_path(save_dir, name))
+        except OSError:  # Removed meanwhile
+            continue
+    return mtimes
+
+
+def directory_state(save_dir):
+    """Return modification time of save_dir and number of saves in it."""
+    return [os.path.getmtime(save_dir), len(save_names(save_dir))]
+
+
+def make_entry(name, summary, saved):
+    """Return index entry of save name from its summary."""
+    codemaker, codebreaker = summary['players']
+    return {
+            'name': name,
+            'saved': saved,
+            'codemaker': codemaker['name'],
+            'codebreaker': codebreaker['name'],
+            'scores': [codemaker['score'], codebreaker['score']],
+            'computers': [codemaker['computer'], codebreaker['computer']],
+            'games': summary['games'],
+            'current_game': summary['current_game'],
+            'current_turn': summary['current_turn'],
+            'length': summary['length'],
+            'colours': len(summary['colours']),
+            'turns': summary['turns']
+            }
+
+
+def rebuild_index(save_dir):
+    """Return index rebuilt from the saves in save_dir, and write it."""
+    files = save_mtimes(save_dir)
+    saves = {}
+    for name, mtime in files.items():
+        try:
+            saves[name] = make_entry(name, read_summary(save_path(save_dir, name)), mtime)
+        except Exception:  # Unreadable saves are left out of the index
+            continue
+
+    index = {'version': INDEX_VERSION, 'saves': saves, 'files': files,
+            'directory': directory_state(save_dir)}
+    write_index(save_dir, index)
+    return index
+
+
+def is_stale(save_dir, index):
+    """Return whether the saves in save_dir differ from those index saw.
+
+    The saves are only stat'ed when the directory changed since the index
+    last saw it; if they still match, the index is brought up to date with
+    the directory, so that the next read is cheap again.
+
+    """
+    state = directory_state(save_dir)
+    if state == index.get('directory'):
+        return False
+    if save_mtimes(save_dir) != index.get('files'):
+        return True
+    index['directory'] = state
+    write_index(save_dir, index)
+    return False
+
+
+def load_index(save_dir):
+    """Return index of save_dir as written, rebuilding it if missing or
+    unreadable."""
+    try:
+        index_file = open(index_name(save_dir))
+        try:
+            index = json.load(index_file)
+        finally:
+            index_file.close()
+    except (IOError, ValueError):
+        return rebuild_index(save_dir)
+
+    if index.get('version') != INDEX_VERSION:
+        return rebuild_index(save_dir)
+    return index
+
+
+def read_index(save_dir):
+    """Return index of save_dir, rebuilding it if missing or stale."""
+    if not os.path.isdir(save_dir):
+        return {'version': INDEX_VERSION, 'saves': {}}
+    index = load_index(save_dir)
+    if is_stale(save_dir, index):
+        return rebuild_index(save_dir)
+    return index
+
+
+def write_index(save_dir, index):
+    """Write index of save_dir."""
+    try:
+        index_file = open(index_name(save_dir), 'w')
+        try:
+            json.dump(index, index_file, sort_keys=True)
+        finally:
+            index_file.close()
+    except IOError:
+        pass  # The index is rebuilt on the next read
+
+
+def update_index(save_dir, name):
+    """Add or refresh the entry of save name in the index of save_dir.
+
+    The index is not checked for staleness, as only the save just written
+    is refreshed; saves changed behind its back are still found stale on
+    the next read.
+
+    """
+    index = load_index(save_dir)
+    path = save_path(save_dir, name)
+    try:
+        summary = read_summary(path)
+    except (EnvironmentError, ValueError, struct.error):
+        index['saves'].pop(name, None)
+    else:
+        index['saves'][name] = make_entry(name, summary, time.time())
+
+    try:
+        index['files'][name] = os.path.getmtime(path)
+    except OSError:
+        index['files'].pop(name, None)
+    index['directory'] = directory_state(save_dir)
+    write_index(save_dir, index)
+
+
+def list_saves(index, sort='saved', text=None):
+    """Return index entries, sorted by given key and filtered to those
+    whose name or players contain text."""
+    entries = index['saves'].values()
+    if text:
+        text = text.lower()
+        entries = [entry for entry in entries if text in entry['name'] or
+                text in entry['codemaker'].lower() or text in entry['codebreaker'].lower()]
+    return sorted(entries, key=SORT_KEYS[sort])
+
+
+def describe_save(entry):
+    """Return one-line description of index entry."""
+    return "%-16s %s  %s %d - %d %s  game %d/%d  %dx%d" % (
+            entry['name'], time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['saved'])),
+            entry['codemaker'], entry['scores'][0], entry['scores'][1], entry['codebreaker'],
+            entry['current_game'] + 1, entry['games'], entry['length'], entry['colours'])
@@ -0,0 +1,145 @@
+"""Headless computer versus computer simulation of the Mastermind project.
+
+Plays complete games between two quiet ComputerPlayers without clearing,
+printing or pausing, to evaluate the solving algorithm:
+    $ ./mastermind.py -s [games] [length] [colours] [seed] [solver]
+
+solver is 'classic' (generate_solutions), 'indexed' (the default) or a
+guess strategy.
+
+"""
+
+import random
+import time
+
+from computer_player import ComputerPlayer
+from game_engine import COLOUR_CODES, FEEDBACK_KEYS, GUESS, TURNS, GameEngine
+from player import Player
+from solving_algorithm import solution_cache
+
+def play_game(codemaker, codebreaker, turns=TURNS):
+    """Play one game; return number of turns to solve, else None."""
+    engine = GameEngine(1, codemaker.pattern_length, codemaker.pattern_colours, turns)
+    engine.start(codemaker, codebreaker)
+    codemaker.choose_secret_pattern()
+    engine.submit_secret(codemaker.secret_pattern)
+
+    while engine.phase == GUESS:
+        codebreaker.make_guess()
+        engine.submit_guess(codebreaker.guess)
+    return engine.turns_to_solve()
+
+
+def solve_secret(codebreaker, secret, turns=TURNS):
+    """Let codebreaker solve given secret; return number of turns to solve,
+    else None."""
+    codemaker = Player()
+    engine = GameEngine(1, codebreaker.pattern_length, codebreaker.pattern_colours, turns)
+    engine.start(codemaker, codebreaker)
+    engine.submit_secret(secret)
+
+    while engine.phase == GUESS:
+        codebreaker.make_guess()
+        engine.submit_guess(codebreaker.guess)
+    return engine.turns_to_solve()
+
+
+def new_stats():
+    """Return empty simulation statistics."""
+    return {'games': 0, 'failures': 0, 'turns': {}, 'seconds': 0.0, 'cache_hits': 0,
+            'cache_misses': 0}
+
+
+def cache_lookups():
+    """Return hits and misses of the solution cache so far."""
+    return solution_cache.hits, solution_cache.misses
+
+
+def add_cache_lookups(stats, before):
+    """Add lookups of the solution cache since before to stats."""
+    hits, misses = cache_lookups()
+    stats['cache_hits'] += hits - before[0]
+    stats['cache_misses'] += misses - before[1]
+
+
+def add_result(stats, turns):
+    """Add result of one game to stats."""
+    stats['games'] += 1
+    if turns is None:
+        stats['failures'] += 1
+    else:
+        stats['turns'][turns] = stats['turns'].get(turns, 0) + 1
+
+
+def merge_stats(total, stats):
+    """Add stats to total."""
+    total['games'] += stats['games']
+    total['failures'] += stats['failures']
+    total['seconds'] += stats['seconds']
+    total['cache_hits'] += stats['cache_hits']
+    total['cache_misses'] += stats['cache_misses']
+    for turns, count in stats['turns'].items():
+        total['turns'][turns] = total['turns'].get(turns, 0) + count
+
+
+def solver_options(solver):
+    """Return strategy and indexed option of the codebreaker for given
+    solver name."""
+    if solver == 'classic':
+        return None, False
+    if solver in (None, 'indexed'):
+        return None, True
+    return solver, True
+
+
+def create_players(length, colours, strategy=None, indexed=True):
+    """Return quiet codemaker and codebreaker for given rules."""
+    pattern_colours = COLOUR_CODES[:colours]
+    codemaker = ComputerPlayer(quiet=True)
+    codebreaker = ComputerPlayer(indexed=indexed, strategy=strategy, quiet=True)
+    codemaker.remember_rules(length, pattern_colours)
+    codebreaker.remember_rules(length, pattern_colours)
+    return codemaker, codebreaker
+
+
+def simulate(games, length=4, colours=6, seed=None, strategy=None, turns=TURNS, indexed=True):
+    """Play games between two computer players; return statistics."""
+    random.seed(seed)
+    codemaker, codebreaker = create_players(length, colours, strategy, indexed)
+
+    stats = new_stats()
+    lookups = cache_lookups()
+    start = time.time()
+    for game in range(games):
+        add_result(stats, play_game(codemaker, codebreaker, turns))
+    stats['seconds'] = time.time() - start
+    add_cache_lookups(stats, lookups)
+    return stats
+
+
+def show_report(stats, width=80):
+    """Show report of simulation statistics."""
+    games = stats['games']
+    solved = games - stats['failures']
+    total_turns = sum(turns * count for turns, count in stats['turns'].items())
+
+    print "Mastermind : Simulation"
+    print "-" * width
+    print "Games            : %d" % games
+    print "Failure rate     : %.2f%%" % (100.0 * stats['failures'] / max(games, 1))
+    if solved:
+        print "Average turns    : %.3f" % (float(total_turns) / solved)
+        print "Worst turns      : %d" % max(stats['turns'])
+    print "Games per second : %.1f" % (games / max(stats['seconds'], 1e-9))
+    lookups = stats['cache_hits'] + stats['cache_misses']
+    if lookups:
+        print "Solution cache   : %d hits, %d misses (%.1f%% hits)" % (stats['cache_hits'],
+                stats['cache_misses'], 100.0 * stats['cache_hits'] / lookups)
+    if stats.get('failed'):
+        print "Failed shards    : %s" % ' '.join(str(shard) for shard, error in stats['failed'])
+    print
+    print "Turns to solve:"
+    for turns in sorted(stats['turns']):
+        count = stats['turns'][turns]
+        print "  %2d : %8d  %s" % (turns, count, '#' * (count * 50 // games))
+    print "-" * width
@@ -1,7 +1,14 @@
 """Implementation of the solving algorithm used in the Mastermind project."""
 
+import random
+from collections import OrderedDict
+from itertools import islice
+from threading import Lock
+
 from functions import remove_empty_elements
+from instrumentation import ENABLED, count, timed
 
+@timed('generate_solutions')
 def generate_solutions(guess, feedback):
     """Generate solutions for given feedback of guess."""
 
@@ -72,6 +79,7 @@ def generate_solutions(guess, feedback):
         return solutions
 
 
+    @timed('generate_solutions merge_solutions')
     def merge_solutions(new_solutions, cumulative_solutions):
         """Merge solutions in new_solutions with those in cumulative_solutions
         whenever possible.
@@ -97,6 +105,7 @@ def generate_solutions(guess, feedback):
         return solutions
 
 
+    @timed('generate_solutions remove_invalid_solutions')
     def remove_invalid_solutions(guess, solutions):
         """Remove invalid solutions.
 
@@ -118,5 +127,192 @@ def generate_solutions(guess, feedback):
     solutions = add_empty_solution(len(guess))  # Start with empty solutions
     for key in feedback:  # Generate and merge solutions for each feedback key
         solutions = merge_solutions(generate_solution[key](guess), solutions)
+        if ENABLED:
+            count('generate_solutions merged per key', len(solutions))
     solutions = remove_invalid_solutions(guess, solutions)
     return solutions
+
+
+def iter_consistent(history, pattern_length, pattern_colours, rng=None):
+    """Yield every pattern consistent with history, one at a time.
+
+    history is a list of (guess, feedback) pairs. Patterns are built peg by
+    peg, backtracking as soon as a partial pattern has too many or can no
+    longer get enough black or total (black and white) keys for some guess,
+    so memory stays bounded by the pattern length and the number of guesses
+    whatever the number of consistent patterns. If rng is given, colours
+    are tried in a random order at every peg, so that the first pattern
+    yielded is a random one.
+
+    >>> list(iter_consistent([(['r', 'g', 'b'], ['b', 'b'])], 3, ['r', 'g', 'b']))[:3]
+    [['r', 'r', 'b'], ['r', 'g', 'r'], ['r', 'g', 'g']]
+
+    """
+    colours = list(pattern_colours)
+    digits = dict((colour, digit) for digit, colour in enumerate(colours))
+
+    # Guesses as digits, -1 for colours not in pattern_colours, with counts
+    guesses = []
+    for guess, feedback in history:
+        whites = list(feedback).count('w')
+        guess_digits = [digits.get(colour, -1) for colour in guess]
+        guess_counts = [guess_digits.count(digit) for digit in range(len(colours))] + [0]
+        guesses.append((guess_digits, guess_counts, len(feedback) - whites, len(feedback)))
+
+    pattern = [None] * pattern_length
+    pattern_counts = [0] * len(colours) + [0]
+    blacks = [0] * len(guesses)
+    matches = [0] * len(guesses)  # Black and white keys
+
+    def place(position):
+        """Yield every consistent pattern with pegs from position on free."""
+        if position == pattern_length:
+            yield [colours[digit] for digit in pattern]
+            return
+
+        remaining = pattern_length - position - 1
+        order = range(len(colours))
+        if rng is not None:
+            rng.shuffle(order)
+        for digit in order:
+            # Score placing digit at position against every guess
+            consistent = True
+            for i, (guess, guess_counts, needed_blacks, needed_matches) in enumerate(guesses):
+                black = blacks[i] + (guess[position] == digit)
+                match = matches[i] + (pattern_counts[digit] < guess_counts[digit])
+                if black > needed_blacks or black + remaining < needed_blacks or \
+                        match > needed_matches or match + remaining < needed_matches:
+                    consistent = False
+                    break
+
+                # Without keys to spare, blacks are left only on used up colours
+                if match == needed_matches and black < needed_blacks:
+                    spare = 0
+                    for guess_digit in guess[position + 1:]:
+                        if pattern_counts[guess_digit] + (guess_digit == digit) >= \
+                                guess_counts[guess_digit]:
+                            spare += 1
+                    if black + spare < needed_blacks:
+                        consistent = False
+                        break
+            if not consistent:
+                continue
+
+            for i, (guess, guess_counts, needed_blacks, needed_matches) in enumerate(guesses):
+                blacks[i] += guess[position] == digit
+                matches[i] += pattern_counts[digit] < guess_counts[digit]
+            pattern[position] = digit
+            pattern_counts[digit] += 1
+
+            for solution in place(position + 1):
+                yield solution
+
+            pattern_counts[digit] -= 1
+            for i, (guess, guess_counts, needed_blacks, needed_matches) in enumerate(guesses):
+                matches[i] -= pattern_counts[digit] < guess_counts[digit]
+                blacks[i] -= guess[position] == digit
+
+    return place(0)
+
+
+def iter_solutions(guess, feedback):
+    """Yield solutions for given feedback of guess, one at a time.
+
+    Lazy counterpart of generate_solutions: for feedback with a key for
+    every peg it yields the same arrangements of the colours of guess.
+
+    """
+    return iter_consistent([(guess, feedback)], len(guess), sorted(set(guess)))
+
+
+def first_solutions(history, pattern_length, pattern_colours, count=1):
+    """Return at most count patterns consistent with history."""
+    return list(islice(iter_consistent(history, pattern_length, pattern_colours), count))
+
+
+def sample_solutions(history, pattern_length, pattern_colours, count, run=1, rng=random):
+    """Return at most count distinct patterns consistent with history, taken
+    run at a time from the start of random enumerations.
+
+    A random enumeration mostly backtracks before its first pattern and
+    then finds the next ones cheaply, so a longer run costs less per
+    pattern but gives patterns sharing more pegs.
+
+    """
+    seen = set()
+    samples = []
+    for attempt in range((count + run - 1) // run):
+        solutions = iter_consistent(history, pattern_length, pattern_colours, rng)
+        for solution in islice(solutions, run):
+            if tuple(solution) not in seen:
+                seen.add(tuple(solution))
+                samples.append(solution)
+    return samples[:count]
+
+
+class SolutionCache(object):
+
+    """Bounded least recently used cache of generate_solutions results.
+
+    Entries are keyed by guess and sorted feedback keys (which also fix the
+    colour set) and stored compactly as tuples of pattern strings. Entries
+    are only touched under a lock, as server sessions solve in threads.
+
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def solutions(self, guess, feedback):
+        """Return solutions for given feedback of guess, cached."""
+        key = (''.join(guess), ''.join(sorted(feedback)))
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            entry = tuple(''.join(solution) for solution in generate_solutions(guess, feedback))
+        else:
+            self.hits += 1
+
+        with self.lock:
+            self.entries[key] = entry  # Most recently used last
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+        return [list(solution) for solution in entry]
+
+
+    def resize(self, max_size):
+        """Set maximum number of entries, evicting the least recently used."""
+        self.max_size = max_size
+        with self.lock:
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+
+    def stats(self):
+        """Return cache counters."""
+        lookups = self.hits + self.misses
+        return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0
+                }
+
+
+solution_cache = SolutionCache()
+
+def cached_solutions(guess, feedback):
+    """Return solutions for given feedback of guess from the shared cache."""
+    return solution_cache.solutions(guess, feedback)
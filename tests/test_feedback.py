@@ -0,0 +1,107 @@
+"""Tests of feedback encoding and batch scoring against the list-based
+feedback the project started with."""
+
+import itertools
+import random
+import unittest
+
+from batch_feedback import _score_batch_python, code_matrix, colour_counts, count_partitions, \
+        numpy, score_batch, score_keys
+from benchmark import list_feedback
+from code_space import get_code_space
+from player import Player
+from simulation import COLOUR_CODES, FEEDBACK_KEYS
+
+def old_key(code_space, secret, guess):
+    """Return encoded feedback of guess against secret by list_feedback."""
+    return code_space.key_of(list_feedback(secret, guess, FEEDBACK_KEYS))
+
+
+class FeedbackEncodingTest(unittest.TestCase):
+
+    def test_keys_round_trip(self):
+        code_space = get_code_space(4, COLOUR_CODES[:6])
+        for blacks in range(5):
+            for whites in range(5 - blacks):
+                key = code_space.feedback_key(blacks, whites)
+                self.assertEqual(code_space.split_key(key), (blacks, whites))
+                self.assertEqual(code_space.key_of(['b'] * blacks + ['w'] * whites), key)
+
+
+    def test_score_every_pair(self):
+        code_space = get_code_space(3, COLOUR_CODES[:4])
+        patterns = [code_space.decode(index) for index in range(code_space.size)]
+        for guess, secret in itertools.product(range(code_space.size), repeat=2):
+            self.assertEqual(code_space.score(guess, secret),
+                    old_key(code_space, patterns[secret], patterns[guess]))
+
+
+    def test_prepare_feedback(self):
+        rng = random.Random(0)
+        for length in range(3, 9):
+            codemaker = Player()
+            codemaker.remember_rules(length, COLOUR_CODES[:6])
+            code_space = codemaker.code_space
+            for game in range(20):
+                secret = code_space.decode(rng.randrange(code_space.size))
+                codemaker.secret_pattern = secret
+                for turn in range(20):
+                    guess = code_space.decode(rng.randrange(code_space.size))
+                    codemaker.prepare_feedback(guess, FEEDBACK_KEYS)
+                    self.assertEqual(codemaker.feedback, list_feedback(secret, guess, FEEDBACK_KEYS))
+
+
+class BatchScoringTest(unittest.TestCase):
+
+    def test_feedback_row(self):
+        code_space = get_code_space(4, COLOUR_CODES[:6])
+        rng = random.Random(1)
+        for guess in rng.sample(range(code_space.size), 20):
+            row = code_space.feedback_row(guess)
+            pattern = code_space.decode(guess)
+            for secret in rng.sample(range(code_space.size), 50):
+                self.assertEqual(row[secret], old_key(code_space, code_space.decode(secret), pattern))
+
+
+    def test_score_keys_of_large_space(self):
+        code_space = get_code_space(6, COLOUR_CODES[:8])
+        rng = random.Random(2)
+        secrets = rng.sample(xrange(code_space.size), 200)
+        matrix = code_matrix(secrets, code_space.pattern_length, code_space.base)
+        for guess in rng.sample(xrange(code_space.size), 10):
+            keys = score_keys(code_space.to_digits(guess), matrix, code_space.base)
+            expected = [old_key(code_space, code_space.decode(secret), code_space.decode(guess))
+                    for secret in secrets]
+            self.assertEqual([int(key) for key in keys], expected)
+
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_matches_python(self):
+        code_space = get_code_space(5, COLOUR_CODES[:8])
+        rng = random.Random(4)
+        secrets = rng.sample(xrange(code_space.size), 300)
+        matrix = [code_space.to_digits(secret) for secret in secrets]
+        for guess in rng.sample(xrange(code_space.size), 10):
+            digits = code_space.to_digits(guess)
+            blacks, whites = score_batch(digits, matrix, code_space.base)
+            self.assertEqual(([int(black) for black in blacks], [int(white) for white in whites]),
+                    _score_batch_python(digits, matrix, code_space.base))
+
+
+    def test_count_partitions(self):
+        code_space = get_code_space(5, COLOUR_CODES[:7])
+        rng = random.Random(3)
+        secrets = rng.sample(xrange(code_space.size), 300)
+        matrix = code_matrix(secrets, code_space.pattern_length, code_space.base)
+        counts = colour_counts(matrix, code_space.base)
+        for guess in rng.sample(xrange(code_space.size), 10):
+            digits = code_space.to_digits(guess)
+            expected = [0] * (code_space.pattern_length + 1) ** 2
+            for key in score_keys(digits, matrix, code_space.base):
+                expected[key] += 1
+            self.assertEqual([int(count) for count in
+                    count_partitions(digits, matrix, counts, code_space.base)], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Tests of the phase transitions and scoring of the game engine."""
+
+import unittest
+
+from game_engine import COLOUR_CODES, DONE, GUESS, OVER, SECRET, GameEngine
+from player import Player
+
+def named_player(name):
+    """Return player of given name."""
+    player = Player()
+    player.name = name
+    return player
+
+
+class GameEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ann = named_player('Ann')
+        self.bob = named_player('Bob')
+        self.engine = GameEngine(2, 4, COLOUR_CODES[:6], 3)
+        self.engine.start(self.ann, self.bob)
+
+
+    def test_phases(self):
+        engine = self.engine
+        self.assertEqual(engine.phase, SECRET)
+        engine.submit_secret(['r', 'g', 'b', 'c'])
+        self.assertEqual(engine.phase, GUESS)
+
+        self.assertEqual(engine.submit_guess(['r', 'g', 'c', 'y']), ['b', 'b', 'w'])
+        self.assertEqual(engine.phase, GUESS)
+        self.assertEqual(engine.submit_guess(['r', 'g', 'b', 'c']), ['b'] * 4)
+        self.assertEqual(engine.phase, OVER)
+        self.assertTrue(engine.is_solved())
+        self.assertEqual(engine.turns_to_solve(), 2)
+
+        engine.next_game()
+        self.assertEqual(engine.phase, SECRET)
+        self.assertEqual((engine.codemaker, engine.codebreaker), (self.bob, self.ann))
+        self.assertEqual((engine.current_game, engine.current_turn), (1, 0))
+
+        engine.submit_secret(['y', 'y', 'y', 'y'])
+        for turn in range(3):
+            engine.submit_guess(['r', 'r', 'r', 'r'])
+        self.assertEqual(engine.phase, OVER)
+        self.assertFalse(engine.is_solved())
+        self.assertIsNone(engine.turns_to_solve())
+
+        engine.next_game()
+        self.assertEqual(engine.phase, DONE)
+
+
+    def test_scores(self):
+        engine = self.engine
+        engine.submit_secret(['r', 'g', 'b', 'c'])
+        engine.submit_guess(['c', 'c', 'c', 'c'])
+        engine.submit_guess(['r', 'g', 'b', 'c'])
+        self.assertEqual((self.ann.score, self.bob.score), (1, 0))
+
+        # Every wrong guess scores, and a wrong last one scores twice
+        engine.next_game()
+        engine.submit_secret(['y', 'y', 'y', 'y'])
+        for turn in range(3):
+            engine.submit_guess(['r', 'r', 'r', 'r'])
+        self.assertEqual((self.ann.score, self.bob.score), (1, 4))
+        self.assertIs(engine.winner(), self.bob)
+
+
+    def test_invalid_transitions(self):
+        engine = self.engine
+        self.assertRaises(ValueError, engine.submit_guess, ['r', 'g', 'b', 'c'])
+        self.assertRaises(ValueError, engine.submit_secret, ['r', 'g', 'b'])
+        self.assertRaises(ValueError, engine.submit_secret, ['r', 'g', 'b', 'p'])
+        self.assertEqual(engine.phase, SECRET)
+
+        engine.submit_secret(['r', 'g', 'b', 'c'])
+        self.assertRaises(ValueError, engine.submit_secret, ['r', 'g', 'b', 'c'])
+        self.assertRaises(ValueError, engine.submit_guess, ['r', 'g', 'b', 'x'])
+        self.assertEqual((engine.phase, engine.current_turn), (GUESS, 0))
+
+        engine.submit_guess(['r', 'g', 'b', 'c'])
+        self.assertRaises(ValueError, engine.submit_guess, ['r', 'g', 'b', 'c'])
+
+
+    def test_restore_phase(self):
+        engine = self.engine
+        restored = GameEngine()
+        restored.restore(engine.state())
+        self.assertEqual(restored.phase, SECRET)
+
+        engine.submit_secret(['r', 'g', 'b', 'c'])
+        engine.submit_guess(['r', 'r', 'r', 'r'])
+        restored.restore(engine.state())
+        self.assertEqual((restored.phase, restored.current_turn), (GUESS, 1))
+
+        engine.submit_guess(['r', 'g', 'b', 'c'])
+        restored.restore(engine.state())
+        self.assertEqual(restored.phase, OVER)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Tests of a game server session over a loopback connection."""
+
+import asyncore
+import itertools
+import random
+import socket
+import threading
+import unittest
+
+from game_engine import FEEDBACK_KEYS
+from game_server import PROTOCOL_VERSION, GameServer
+from player import Player
+
+def feedback_word(guess, secret, colours):
+    """Return feedback of guess against secret as a protocol word."""
+    codemaker = Player()
+    codemaker.remember_rules(len(secret), colours)
+    codemaker.secret_pattern = list(secret)
+    codemaker.prepare_feedback(list(guess), FEEDBACK_KEYS)
+    return ''.join(codemaker.feedback) or '-'
+
+
+class GameServerTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.server = GameServer('127.0.0.1:0', 2)
+        self.running = True
+        self.loop = threading.Thread(target=self.serve)
+        self.loop.start()
+
+        self.client = socket.create_connection(self.server.socket.getsockname(), timeout=30)
+        self.lines = self.client.makefile('rb')
+
+
+    def tearDown(self):
+        self.client.close()
+        self.running = False
+        self.loop.join()
+        self.server.shutdown()
+
+
+    def serve(self):
+        """Run the event loop of the server until the test is over."""
+        while self.running:
+            asyncore.loop(timeout=0.05, use_poll=True, map=self.server.map, count=1)
+
+
+    def send(self, line):
+        self.client.sendall(line + '\n')
+
+
+    def receive(self):
+        """Return next line from the server."""
+        line = self.lines.readline()
+        self.assertTrue(line.endswith('\r\n'), "Connection closed")
+        return line.strip()
+
+
+    def test_menu(self):
+        self.assertEqual(self.receive(), "MASTERMIND %d" % PROTOCOL_VERSION)
+        self.assertEqual(self.receive(), "MENU name|play|watch|quit")
+        self.send("bogus")
+        self.assertEqual(self.receive(), "ERROR Unknown command")
+        self.assertEqual(self.receive(), "MENU name|play|watch|quit")
+        self.send("NAME ann")
+        self.assertEqual(self.receive(), "NAME Ann")
+        self.send("play 2 9 6")
+        self.assertTrue(self.receive().startswith("ERROR"))
+        self.send("quit")
+        self.assertEqual(self.receive(), "BYE")
+
+
+    def test_play(self):
+        colours = 'rgbc'
+        self.receive()
+        self.receive()
+        self.send("name Ann")
+        self.receive()
+        self.send("play 2 3 4")
+
+        roles = []
+        candidates = []
+        guess = None
+        while True:
+            line = self.receive()
+            words = line.split()
+            if words[0] == 'GAME':
+                roles.append(words[3])  # Codemaker
+                candidates = [''.join(code) for code in itertools.product(colours, repeat=3)]
+            elif line == 'SECRET?':
+                self.send("rgx")
+                self.assertTrue(self.receive().startswith("ERROR Use 3 of rgbc"))
+                self.assertEqual(self.receive(), "SECRET?")
+                self.send("rgb")
+            elif words[0] == 'GUESS?':
+                guess = candidates[0]
+                self.send(guess)
+            elif words[0] == 'FEEDBACK':
+                if guess is not None:  # Feedback of our guess
+                    candidates = [code for code in candidates
+                            if feedback_word(guess, code, colours) == words[2]]
+                    guess = None
+                else:  # Feedback of a computer guess against our secret
+                    self.assertEqual(words[2], feedback_word(computer_guess, 'rgb', colours))
+            elif words[0] == 'GUESS':
+                computer_guess = words[2]
+            elif words[0] in ('WINNER', 'TIE'):
+                break
+            else:
+                self.assertIn(words[0], ('SOLVED', 'FAILED', 'SCORE'))
+
+        self.assertEqual(len(roles), 2)
+        self.assertIn('Ann', roles)
+        self.assertEqual(self.receive(), "MENU name|play|watch|quit")
+
+
+    def test_watch(self):
+        self.receive()
+        self.receive()
+        self.send("watch 1 4 6 minimax")
+        self.assertTrue(self.receive().startswith("GAME 1/1"))
+        line = self.receive()
+        while line.startswith('GUESS') or line.startswith('FEEDBACK'):
+            line = self.receive()
+        self.assertTrue(line.startswith('SOLVED'))
+        self.assertTrue(self.receive().startswith('SCORE'))
+        self.assertTrue(self.receive().split()[0] in ('WINNER', 'TIE'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Tests of the autosave journal: replay of turns after a snapshot, and
+recovery from a torn or corrupt tail."""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from computer_player import ComputerPlayer
+from game_engine import COLOUR_CODES, FEEDBACK_KEYS, GameEngine
+from journal import JOURNAL_NAME, Journal, read_journal
+from player import Player
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.journal_dir = tempfile.mkdtemp()
+        self.journal_name = os.path.join(self.journal_dir, JOURNAL_NAME)
+        random.seed(0)
+
+        codemaker = Player()
+        codemaker.name = 'Ann'
+        self.engine = GameEngine(2, 4, COLOUR_CODES[:6], 12)
+        self.engine.start(codemaker, ComputerPlayer(quiet=True))
+        self.engine.submit_secret(['r', 'g', 'b', 'y'])
+
+        self.journal = Journal(self.journal_name)
+        self.journal.compact(self.engine.state())
+
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.journal_dir)
+
+
+    def play_turns(self, turns):
+        """Play turns, recording each in the journal."""
+        for turn in range(turns):
+            codebreaker = self.engine.codebreaker
+            codebreaker.make_guess()
+            feedback = self.engine.submit_guess(codebreaker.guess)
+            self.journal.record_turn(self.engine.current_turn - 1, codebreaker.guess, feedback)
+        self.journal.sync()
+
+
+    def test_replay(self):
+        self.play_turns(4)
+        state = read_journal(self.journal_name, FEEDBACK_KEYS)
+        self.assertEqual(state['current_turn'], 4)
+        self.assertEqual(state['guesses'], self.engine.guesses)
+        self.assertEqual(state['feedback'], self.engine.feedback)
+        self.assertEqual(state['codemaker'].score, 4)
+        self.assertEqual(state['codemaker'].secret_pattern, ['r', 'g', 'b', 'y'])
+
+        # The codebreaker has been replayed the log, so it guesses on as before
+        restored = state['codebreaker']
+        restored.quiet = True
+        restored.make_guess()
+        self.engine.codebreaker.make_guess()
+        self.assertEqual(restored.guess, self.engine.codebreaker.guess)
+
+
+    def test_torn_tail(self):
+        self.play_turns(3)
+        size = os.path.getsize(self.journal_name)
+        self.play_turns(1)
+
+        # A crash while appending the last turn leaves part of its record
+        data = open(self.journal_name, 'rb').read()
+        for end in range(size, len(data)):
+            journal_file = open(self.journal_name, 'wb')
+            journal_file.write(data[:end])
+            journal_file.close()
+
+            state = read_journal(self.journal_name, FEEDBACK_KEYS)
+            self.assertEqual(state['current_turn'], 3)
+            self.assertEqual(state['guesses']['0'], self.engine.guesses['0'][:3])
+            self.assertEqual(state['codemaker'].score, 3)
+
+
+    def test_corrupt_tail(self):
+        self.play_turns(3)
+        journal_file = open(self.journal_name, 'r+b')
+        journal_file.seek(-6, os.SEEK_END)  # In the payload of the last turn
+        byte = journal_file.read(1)
+        journal_file.seek(-6, os.SEEK_END)
+        journal_file.write(chr(ord(byte) ^ 0xff))
+        journal_file.close()
+
+        state = read_journal(self.journal_name, FEEDBACK_KEYS)
+        self.assertEqual(state['current_turn'], 2)
+        self.assertEqual(state['feedback']['0'], self.engine.feedback['0'][:2])
+
+
+    def test_compact(self):
+        self.play_turns(2)
+        self.journal.compact(self.engine.state())
+        self.assertFalse(os.path.exists(self.journal_name + '.tmp'))
+        self.play_turns(1)
+
+        state = read_journal(self.journal_name, FEEDBACK_KEYS)
+        self.assertEqual(state['current_turn'], 3)
+        self.assertEqual(state['guesses'], self.engine.guesses)
+
+
+    def test_remove(self):
+        self.play_turns(1)
+        self.journal.remove()
+        self.assertIsNone(read_journal(self.journal_name, FEEDBACK_KEYS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""Tests of the binary save format, and of the conversion of saves of the
+earlier pickle format."""
+
+import copy_reg
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import unittest
+
+from computer_player import ComputerPlayer
+from game_engine import COLOUR_CODES, FEEDBACK_KEYS, GameEngine
+from player import Player
+import save_format
+from save_format import read_header, read_save, read_summary, write_save
+
+class LegacyPlayer(object):
+
+    """Stand-in pickled as a player of the earlier format, whose instance
+    dict held the rules."""
+
+    def __init__(self, cls, **state):
+        self.cls = cls
+        self.state = state
+
+
+    def __reduce__(self):
+        return copy_reg._reconstructor, (self.cls, object, None), self.state
+
+
+def play_turns(engine, turns):
+    """Play turns of the current game of engine with a random secret."""
+    engine.submit_secret([random.choice(engine.colours) for peg in range(engine.length)])
+    for turn in range(turns):
+        engine.codebreaker.make_guess()
+        engine.submit_guess(engine.codebreaker.guess)
+
+
+class SaveFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.save_dir = tempfile.mkdtemp()
+        self.save_name = os.path.join(self.save_dir, 'test.sav')
+        random.seed(0)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.save_dir)
+
+
+    def test_round_trip(self):
+        codemaker = Player()
+        codemaker.name = 'Ann'
+        codebreaker = ComputerPlayer(quiet=True)
+        codebreaker.name = 'GLaDOS'
+        engine = GameEngine(2, 4, COLOUR_CODES[:6], 12)
+        engine.start(codemaker, codebreaker)
+        play_turns(engine, 3)
+        write_save(self.save_name, engine.state())
+
+        state = read_save(self.save_name, FEEDBACK_KEYS)
+        for key in ('games', 'length', 'turns', 'colours', 'current_game', 'current_turn',
+                'guesses', 'feedback'):
+            self.assertEqual(state[key], engine.state()[key])
+        self.assertEqual(state['codemaker'].name, 'Ann')
+        self.assertEqual(state['codemaker'].score, 3)
+        self.assertEqual(state['codemaker'].secret_pattern, codemaker.secret_pattern)
+        self.assertIsInstance(state['codebreaker'], ComputerPlayer)
+        self.assertEqual(state['codebreaker'].name, 'GLaDOS')
+
+        # The log is replayed, so the codebreaker guesses on as before
+        restored = state['codebreaker']
+        restored.quiet = True
+        restored.make_guess()
+        codebreaker.make_guess()
+        self.assertEqual(restored.guess, codebreaker.guess)
+
+        header = read_header(self.save_name)
+        self.assertEqual((header['games'], header['current_game'], header['current_turn']), (2, 0, 3))
+        summary = read_summary(self.save_name)
+        self.assertEqual([player['name'] for player in summary['players']], ['Ann', 'GLaDOS'])
+        self.assertEqual([player['computer'] for player in summary['players']], [False, True])
+
+
+    def test_strategy_round_trip(self):
+        engine = GameEngine(1, 4, COLOUR_CODES[:6], 12)
+        engine.start(ComputerPlayer(quiet=True), ComputerPlayer(strategy='minimax', quiet=True))
+        play_turns(engine, 2)
+        write_save(self.save_name, engine.state())
+
+        codebreaker = read_save(self.save_name, FEEDBACK_KEYS)['codebreaker']
+        self.assertEqual(codebreaker.strategy, 'minimax')
+        self.assertTrue(codebreaker.indexed)
+        self.assertEqual(len(codebreaker.candidates), len(engine.codebreaker.candidates))
+
+
+    def test_long_name_round_trip(self):
+        codemaker = Player()
+        codemaker.name = 'Ann' * 100
+        engine = GameEngine(1, 4, COLOUR_CODES[:6], 12)
+        engine.start(codemaker, ComputerPlayer(quiet=True))
+        play_turns(engine, 1)
+        write_save(self.save_name, engine.state())
+
+        self.assertEqual(read_save(self.save_name, FEEDBACK_KEYS)['codemaker'].name, 'Ann' * 100)
+        self.assertEqual(read_summary(self.save_name)['players'][0]['name'], 'Ann' * 100)
+
+
+    def test_version_1(self):
+        codemaker = Player()
+        codemaker.name = 'Ann'
+        engine = GameEngine(2, 4, COLOUR_CODES[:6], 12)
+        engine.start(codemaker, ComputerPlayer(quiet=True))
+        play_turns(engine, 2)
+
+        # Version 1 saves packed names with a one-byte length
+        save_format.SAVE_VERSION = 1
+        try:
+            write_save(self.save_name, engine.state())
+        finally:
+            save_format.SAVE_VERSION = 2
+
+        state = read_save(self.save_name, FEEDBACK_KEYS)
+        self.assertEqual(state['version'], 1)
+        self.assertEqual(state['guesses'], engine.state()['guesses'])
+        self.assertEqual([state['codemaker'].name, state['codemaker'].score], ['Ann', 2])
+        self.assertEqual(read_summary(self.save_name)['players'][1]['computer'], True)
+
+
+    def test_legacy_conversion(self):
+        colours = COLOUR_CODES[:6]
+        codemaker = LegacyPlayer(ComputerPlayer, name='Wheatley', score=2, pattern_length=4,
+                pattern_colours=colours, secret_pattern=['r', 'g', 'b', 'b'], pause=0.1)
+        codebreaker = LegacyPlayer(Player, name='Bob', score=1, pattern_length=4,
+                pattern_colours=colours)
+        guesses = {'0': [['r', 'g', 'b', 'b']], '1': [['r', 'r', 'g', 'g'], ['c', 'c', 'm', 'm']]}
+        feedback = {'0': [['b', 'b', 'b', 'b']], '1': [['b', 'w'], []]}
+
+        save_file = open(self.save_name, 'wb')
+        for value in (2, 4, 6, 12, guesses, feedback, None, colours, 1, 2, codemaker, codebreaker):
+            pickle.dump(value, save_file)
+        save_file.close()
+
+        state = read_save(self.save_name, FEEDBACK_KEYS)
+        self.assertTrue(state['legacy'])
+        self.assertEqual((state['games'], state['length'], state['turns']), (2, 4, 12))
+        self.assertEqual(state['guesses'], guesses)
+        self.assertIsInstance(state['codemaker'], ComputerPlayer)
+        self.assertEqual(state['codemaker'].secret_pattern, ['r', 'g', 'b', 'b'])
+        self.assertEqual(state['codebreaker'].name, 'Bob')
+        self.assertEqual(state['codebreaker'].pattern_length, 4)
+        self.assertEqual(read_summary(self.save_name)['players'][0]['name'], 'Wheatley')
+
+        # Converted saves read back the same in the binary format
+        write_save(self.save_name, state)
+        converted = read_save(self.save_name, FEEDBACK_KEYS)
+        self.assertNotIn('legacy', converted)
+        for key in ('games', 'length', 'turns', 'colours', 'current_game', 'guesses', 'feedback'):
+            self.assertEqual(converted[key], state[key])
+        self.assertEqual(converted['codemaker'].score, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()